@@ -0,0 +1,58 @@
+"""Auth overhead per request with and without the verified-token cache.
+
+Signs a token with the fake identity provider and runs the verification
+path requires_auth takes, N times each way: JWKS lookup plus jose.jwt.decode
+on every request, and the same behind TokenCache. No network access is
+needed.
+
+    python bench_token_cache.py --requests 5000
+"""
+import argparse
+import time
+
+from jose import jwt
+
+from fake_jwks import FakeJWKSServer
+from jwks_cache import JWKSCache
+from token_cache import TokenCache
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=5000)
+    args = parser.parse_args()
+
+    with FakeJWKSServer() as idp:
+        idp.publish('key-1')
+        jwks = JWKSCache(idp.url)
+        token = idp.token('key-1', {
+            'sub': 'bench-user',
+            'exp': int(time.time()) + 3600,
+            'permissions': ['get:drinks-detail', 'post:drinks', 'patch:drinks', 'delete:drinks'],
+        })
+
+        def verify_decode_jwt(token):
+            rsa_key = jwks.get_key(jwt.get_unverified_header(token)['kid'])
+            payload = jwt.decode(token, rsa_key, algorithms=['RS256'])
+            payload['permissions'] = frozenset(payload['permissions'])
+            return payload
+
+        started = time.perf_counter()
+        for _ in range(args.requests):
+            'delete:drinks' in verify_decode_jwt(token)['permissions']
+        before = (time.perf_counter() - started) / args.requests
+
+        verified = TokenCache()
+        started = time.perf_counter()
+        for _ in range(args.requests):
+            'delete:drinks' in verified.verify(token, verify_decode_jwt)['permissions']
+        after = (time.perf_counter() - started) / args.requests
+
+    stats = verified.stats()
+    print('per request, verify every time: {:8.1f} us'.format(before * 1e6))
+    print('per request, verified cache:    {:8.1f} us'.format(after * 1e6))
+    print('hit rate {:.4f}, verification time saved {:.2f} s'.format(stats['hit_rate'], stats['saved_seconds']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+import threading
+import time
+import unittest
+
+from jose import jwt
+
+from fake_jwks import FakeJWKSServer
+from jwks_cache import JWKSCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class JWKSCacheTestCase(unittest.TestCase):
+    """This class represents the JWKS cache test case"""
+
+    def setUp(self):
+        self.idp = FakeJWKSServer().start()
+        self.idp.publish('key-1')
+        self.clock = Clock()
+        self.jwks = JWKSCache(self.idp.url, ttl=600, refresh_ahead=60, retry_interval=30,
+                              refetch_interval=5, clock=self.clock)
+
+    def tearDown(self):
+        self.idp.stop()
+
+    def wait_for_refresh(self):
+        self.jwks._wait()
+
+    def test_keys_are_fetched_once_per_ttl(self):
+        for _ in range(50):
+            self.assertEqual(self.jwks.get_key('key-1')['kid'], 'key-1')
+        self.assertEqual(self.idp.requests, 1)
+
+    def test_token_verifies_with_cached_key(self):
+        token = self.idp.token('key-1', {'sub': 'user'})
+        kid = jwt.get_unverified_header(token)['kid']
+        payload = jwt.decode(token, self.jwks.get_key(kid), algorithms=['RS256'])
+        self.assertEqual(payload['sub'], 'user')
+
+    def test_background_refresh_before_expiry(self):
+        self.jwks.get_key('key-1')
+        self.idp.delay = 0.2
+        self.clock.now += 550
+        self.assertIsNotNone(self.jwks.get_key('key-1'))
+        self.wait_for_refresh()
+        self.assertEqual(self.idp.requests, 2)
+        self.clock.now += 100
+        self.jwks.get_key('key-1')
+        self.assertEqual(self.idp.requests, 2)
+
+    def test_unknown_kid_refetches_once(self):
+        self.jwks.get_key('key-1')
+        self.clock.now += 10
+        self.idp.publish('key-1', 'key-2')
+        self.assertEqual(self.jwks.get_key('key-2')['kid'], 'key-2')
+        self.assertEqual(self.idp.requests, 2)
+
+        self.clock.now += 10
+        self.assertIsNone(self.jwks.get_key('unknown'))
+        self.clock.now += 10
+        self.assertIsNone(self.jwks.get_key('unknown'))
+        self.assertEqual(self.idp.requests, 3)
+
+    def test_unknown_kids_are_rate_limited(self):
+        self.jwks.get_key('key-1')
+        self.clock.now += 10
+        for n in range(20):
+            self.jwks.get_key('made-up-{}'.format(n))
+        self.assertEqual(self.idp.requests, 2)
+
+    def test_concurrent_unknown_kid_is_single_flight(self):
+        self.jwks.get_key('key-1')
+        self.clock.now += 10
+        self.idp.publish('key-1', 'key-2')
+        self.idp.delay = 0.2
+        found = []
+        threads = [threading.Thread(target=lambda: found.append(self.jwks.get_key('key-2')))
+                   for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(found), 20)
+        self.assertTrue(all(key['kid'] == 'key-2' for key in found))
+        self.assertEqual(self.idp.requests, 2)
+
+    def test_stale_keys_served_when_provider_is_down(self):
+        self.jwks.get_key('key-1')
+        self.idp.fail = True
+        self.clock.now += 700
+        self.assertEqual(self.jwks.get_key('key-1')['kid'], 'key-1')
+        self.wait_for_refresh()
+        self.assertEqual(self.jwks.failures, 1)
+
+        self.clock.now += 10
+        self.jwks.get_key('key-1')
+        self.wait_for_refresh()
+        self.assertEqual(self.idp.requests, 2)
+
+        self.idp.fail = False
+        self.clock.now += 30
+        self.jwks.get_key('key-1')
+        self.wait_for_refresh()
+        self.assertEqual(self.idp.requests, 3)
+        self.assertEqual(self.jwks.fetches, 2)
+
+    def test_expired_keys_do_not_wait_for_a_provider_that_is_down(self):
+        # real clock and a provider that fails slowly: once keys are held,
+        # no lookup waits for it, before or after the retry interval
+        jwks = JWKSCache(self.idp.url, ttl=0.2, refresh_ahead=0, retry_interval=0.2, timeout=5)
+        jwks.get_key('key-1')
+        self.idp.fail = True
+        self.idp.delay = 1
+        time.sleep(0.3)
+        for _ in range(3):
+            started = time.monotonic()
+            self.assertEqual(jwks.get_key('key-1')['kid'], 'key-1')
+            self.assertLess(time.monotonic() - started, 0.1)
+            time.sleep(0.5)
+        jwks._wait()
+        self.assertEqual(jwks.fetches, 1)
+        self.assertGreaterEqual(jwks.failures, 1)
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+
+from token_cache import TokenCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TokenCacheTestCase(unittest.TestCase):
+    """This class represents the verified token cache test case"""
+
+    def setUp(self):
+        self.clock = Clock()
+        self.verified = TokenCache(maxsize=2, clock=self.clock)
+        self.calls = []
+
+    def verify(self, token):
+        self.calls.append(token)
+        if token == 'bad':
+            raise ValueError(token)
+        return {'sub': token, 'exp': 1060}
+
+    def test_token_is_verified_once(self):
+        for _ in range(5):
+            self.assertEqual(self.verified.verify('a', self.verify)['sub'], 'a')
+        self.assertEqual(self.calls, ['a'])
+        stats = self.verified.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (4, 1))
+        self.assertEqual(stats['hit_rate'], 0.8)
+
+    def test_entry_expires_at_exp(self):
+        self.verified.verify('a', self.verify)
+        self.clock.now = 1060
+        self.verified.verify('a', self.verify)
+        self.assertEqual(self.calls, ['a', 'a'])
+
+    def test_max_age_shortens_lifetime(self):
+        verified = TokenCache(max_age=10, clock=self.clock)
+        verified.verify('a', self.verify)
+        self.clock.now += 10
+        verified.verify('a', self.verify)
+        self.assertEqual(self.calls, ['a', 'a'])
+
+    def test_least_recently_used_is_evicted(self):
+        self.verified.verify('a', self.verify)
+        self.verified.verify('b', self.verify)
+        self.verified.verify('a', self.verify)
+        self.verified.verify('c', self.verify)
+        self.verified.verify('a', self.verify)
+        self.verified.verify('b', self.verify)
+        self.assertEqual(self.calls, ['a', 'b', 'c', 'b'])
+
+    def test_failures_are_not_cached(self):
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                self.verified.verify('bad', self.verify)
+        self.assertEqual(self.calls, ['bad', 'bad'])
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,11 @@
+import os
 from flask import Flask, request, jsonify, abort
 
+from greeting_store import GreetingStore
+
 app = Flask(__name__)
 
-greetings = {
+default_greetings = {
             'en': 'hello', 
             'es': 'Hola', 
             'ar': 'مرحبا',
@@ -12,22 +15,29 @@ greetings = {
             'ja': 'こんにちは'
             }
 
+# shared by all workers through an append-only log, see greeting_store.py;
+# it lives in the instance folder unless GREETINGS_LOG names another file
+os.makedirs(app.instance_path, exist_ok=True)
+greetings = GreetingStore(
+    os.environ.get('GREETINGS_LOG', os.path.join(app.instance_path, 'greetings.log')),
+    defaults=default_greetings)
+
 @app.route('/greeting', methods=['GET'])
 def greeting_all():
-    return jsonify({'greetings': greetings})
+    return app.response_class(greetings.payload(), mimetype='application/json')
 
 @app.route('/greeting/<lang>', methods=['GET'])
 def greeting_one(lang):
     print(lang)
-    if(lang not in greetings):
+    greeting = greetings.get(lang)
+    if(greeting is None):
         abort(404)
-    return jsonify({'greeting': greetings[lang
-    ]})
+    return jsonify({'greeting': greeting})
 
 @app.route('/greeting', methods=['POST'])
 def greeting_add():
     info = request.get_json()
     if('lang' not in info or 'greeting' not in info):
         abort(422)
-    greetings[info['lang']] = info['greeting']
-    return jsonify({'greetings':greetings})
+    greetings.set(info['lang'], info['greeting'])
+    return app.response_class(greetings.payload(), mimetype='application/json')
@@ -0,0 +1,73 @@
+"""GET /greeting throughput: jsonify of a module dict against the cached payload.
+
+Serves the greetings both ways through the Flask test client from several
+threads, first the way FlaskRecap.py used to (jsonify on every request),
+then from GreetingStore, and prints requests per second for each along
+with the cost of building the body alone.
+
+    python bench_greetings.py --threads 8 --requests 20000
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from flask import Flask, jsonify
+
+from greeting_store import GreetingStore
+
+
+def throughput(app, threads, requests):
+    per_thread = requests // threads
+
+    def client():
+        with app.test_client() as test_client:
+            for _ in range(per_thread):
+                test_client.get('/greeting')
+
+    workers = [threading.Thread(target=client) for _ in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return per_thread * threads / (time.perf_counter() - started)
+
+
+def body_cost(app, view, repeat=10000):
+    with app.test_request_context('/greeting'):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            view()
+        return (time.perf_counter() - started) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--greetings', type=int, default=100)
+    args = parser.parse_args()
+
+    greetings = {'lang{}'.format(n): 'greeting {}'.format(n) for n in range(args.greetings)}
+
+    before = Flask('before')
+    before_view = lambda: jsonify({'greetings': greetings})
+    before.add_url_rule('/greeting', 'greeting_all', before_view)
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = GreetingStore(os.path.join(directory, 'greetings.log'), defaults=greetings)
+        after = Flask('after')
+        after_view = lambda: after.response_class(store.payload(), mimetype='application/json')
+        after.add_url_rule('/greeting', 'greeting_all', after_view)
+
+        print('jsonify every request: {:8.0f} req/s, body {:6.1f} us'.format(
+            throughput(before, args.threads, args.requests), body_cost(before, before_view)))
+        print('GreetingStore payload: {:8.0f} req/s, body {:6.1f} us'.format(
+            throughput(after, args.threads, args.requests), body_cost(after, after_view)))
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
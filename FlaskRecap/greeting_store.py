@@ -0,0 +1,154 @@
+"""Greetings shared by every thread and worker process of the service.
+
+    store = GreetingStore('greetings.log', defaults={'en': 'hello'})
+    store.set('de', 'Hallo')
+    store.get('de'), store.all(), store.payload()
+
+Writes are appended as JSON lines to a log file that all workers open, under
+an exclusive flock so concurrent appends never interleave. Each process
+replays the log on top of the defaults into a dict that is never modified
+once published: a write builds a new dict and swaps it in, so readers take
+no lock. Before answering, a reader compares the log size with the part it
+has applied (one fstat) and catches up on writes made by other workers.
+
+The encoded {"greetings": ...} body is built once per snapshot, so GET
+/greeting returns cached bytes until the next write. The log grows by one
+line per write until it holds more than `compact_after` lines and twice as
+many lines as languages; the writer that crosses that line then compacts
+it. Compaction writes one line per language to a new file under the flock,
+renames it over the log and appends a {"compacted": true} line to the old
+file, so readers still on the old file reopen the log when they reach that
+line, and writers check that their file is still the log after taking the
+flock. Delete the log to go back to the defaults.
+"""
+import fcntl
+import json
+import os
+import threading
+
+COMPACTED = (json.dumps({'compacted': True}) + '\n').encode('utf-8')
+
+
+class GreetingStore:
+
+    def __init__(self, path, defaults=None, compact_after=1000):
+        self.path = path
+        self.compact_after = compact_after
+        self._defaults = dict(defaults or {})
+        self._lock = threading.Lock()
+        self._publish(self._defaults)
+        self._open()
+        self._catch_up()
+
+    def get(self, lang, default=None):
+        self._sync()
+        return self._snapshot.get(lang, default)
+
+    def all(self):
+        """The current greetings; the dict is shared and must not be modified."""
+        self._sync()
+        return self._snapshot
+
+    def payload(self):
+        """The UTF-8 JSON body {"greetings": {...}} of the current snapshot."""
+        self._sync()
+        return self._state[1]
+
+    def set(self, lang, greeting):
+        line = (json.dumps({'lang': lang, 'greeting': greeting}) + '\n').encode('utf-8')
+        with self._lock:
+            while True:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+                try:
+                    if not self._replaced():
+                        os.write(self._fd, line)
+                        break
+                finally:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+                # compacted by another worker since this one opened the log
+                os.close(self._fd)
+                self._open()
+        self._catch_up()
+        if self._lines > self.compact_after and self._lines > 2 * len(self._logged):
+            self.compact()
+
+    def compact(self):
+        """Rewrite the log with one line per language."""
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                if self._replaced():
+                    return
+                self._read()
+                tmp = self.path + '.compact'
+                with open(tmp, 'wb') as f:
+                    for lang, greeting in self._logged.items():
+                        f.write((json.dumps({'lang': lang, 'greeting': greeting}) + '\n').encode('utf-8'))
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, self.path)
+                os.write(self._fd, COMPACTED)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._open()
+            self._read()
+
+    def close(self):
+        os.close(self._fd)
+
+    @property
+    def _snapshot(self):
+        return self._state[0]
+
+    def _publish(self, greetings):
+        payload = json.dumps({'greetings': greetings}).encode('utf-8')
+        self._state = (greetings, payload)
+
+    def _open(self):
+        # called with self._lock held, or before the store is shared
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        self._offset = 0
+        self._lines = 0
+        self._logged = {}
+
+    def _replaced(self):
+        try:
+            return os.stat(self.path).st_ino != os.fstat(self._fd).st_ino
+        except FileNotFoundError:
+            return True
+
+    def _sync(self):
+        if os.fstat(self._fd).st_size != self._offset:
+            self._catch_up()
+
+    def _catch_up(self):
+        with self._lock:
+            self._read()
+
+    def _read(self):
+        # called with self._lock held
+        size = os.fstat(self._fd).st_size
+        if size == self._offset:
+            return
+        data = os.pread(self._fd, size - self._offset, self._offset)
+        # a line still being written by another worker is picked up next time
+        end = data.rfind(b'\n') + 1
+        if not end:
+            return
+        # a file read from the start is replayed on the defaults; until then
+        # readers keep the previous snapshot
+        greetings = dict(self._snapshot if self._offset else self._defaults)
+        for line in data[:end].splitlines():
+            entry = json.loads(line)
+            if entry.get('compacted'):
+                # the log was renamed over this file: start again from the new one
+                os.close(self._fd)
+                self._open()
+                self._read()
+                return
+            self._logged[entry['lang']] = entry['greeting']
+            greetings[entry['lang']] = entry['greeting']
+            self._lines += 1
+        self._offset += end
+        self._publish(greetings)
@@ -0,0 +1,115 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from multiprocessing import Process
+
+from greeting_store import GreetingStore
+
+DEFAULTS = {'en': 'hello', 'es': 'Hola'}
+
+
+def write_greetings(path, worker, count, languages=None, compact_after=1000):
+    store = GreetingStore(path, defaults=DEFAULTS, compact_after=compact_after)
+    for n in range(count):
+        store.set('w{}-{}'.format(worker, n % (languages or count)), 'greeting {}'.format(n))
+    store.close()
+
+
+class GreetingStoreTestCase(unittest.TestCase):
+    """This class represents the greeting store concurrency stress test"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'greetings.log')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_defaults_and_writes_survive_reopen(self):
+        store = GreetingStore(self.path, defaults=DEFAULTS)
+        store.set('de', 'Hallo')
+        store.set('en', 'hi')
+        store.close()
+
+        store = GreetingStore(self.path, defaults=DEFAULTS)
+        self.assertEqual(store.all(), {'en': 'hi', 'es': 'Hola', 'de': 'Hallo'})
+        self.assertEqual(store.payload(), b'{"greetings": {"en": "hi", "es": "Hola", "de": "Hallo"}}')
+        store.close()
+
+    def test_payload_is_cached_until_next_write(self):
+        store = GreetingStore(self.path, defaults=DEFAULTS)
+        payload = store.payload()
+        self.assertIs(store.payload(), payload)
+        store.set('de', 'Hallo')
+        self.assertIsNot(store.payload(), payload)
+        store.close()
+
+    def test_concurrent_threads_lose_no_writes(self):
+        store = GreetingStore(self.path, defaults=DEFAULTS)
+        snapshots = []
+
+        def write(worker):
+            for n in range(200):
+                store.set('t{}-{}'.format(worker, n), str(n))
+
+        def read():
+            for _ in range(2000):
+                snapshots.append(len(store.all()))
+
+        threads = [threading.Thread(target=write, args=(worker,)) for worker in range(8)]
+        threads += [threading.Thread(target=read) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(store.all()), len(DEFAULTS) + 8 * 200)
+        self.assertTrue(all(len(DEFAULTS) <= size <= len(DEFAULTS) + 1600 for size in snapshots))
+        store.close()
+
+    def test_concurrent_processes_share_state(self):
+        reader = GreetingStore(self.path, defaults=DEFAULTS)
+        workers = [Process(target=write_greetings, args=(self.path, worker, 200)) for worker in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(len(reader.all()), len(DEFAULTS) + 4 * 200)
+        self.assertEqual(reader.get('w3-199'), 'greeting 199')
+        reader.close()
+
+    def test_compaction_keeps_every_write(self):
+        store = GreetingStore(self.path, defaults=DEFAULTS, compact_after=10)
+        for n in range(50):
+            store.set('de', 'Hallo {}'.format(n))
+        self.assertEqual(store.get('de'), 'Hallo 49')
+        with open(self.path) as f:
+            self.assertLessEqual(len(f.readlines()), 11)
+        store.close()
+
+        store = GreetingStore(self.path, defaults=DEFAULTS)
+        self.assertEqual(store.all(), dict(DEFAULTS, de='Hallo 49'))
+        store.close()
+
+    def test_concurrent_processes_share_state_across_compactions(self):
+        # each worker rewrites 10 languages, so the log is compacted many times
+        reader = GreetingStore(self.path, defaults=DEFAULTS)
+        workers = [Process(target=write_greetings, args=(self.path, worker, 400, 10, 20)) for worker in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(len(reader.all()), len(DEFAULTS) + 4 * 10)
+        self.assertEqual(reader.get('w3-9'), 'greeting 399')
+        with open(self.path) as f:
+            self.assertLess(len(f.readlines()), 4 * 400)
+        reader.close()
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1 @@
+"""Benchmark harness for the Flask apps in this repository; see __main__.py."""
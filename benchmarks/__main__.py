@@ -0,0 +1,210 @@
+"""Benchmark suite for the Flask apps in this repository.
+
+    python -m benchmarks run --scale 100k --output results.json
+    python -m benchmarks run --apps trivia,coffee_shop --database-url postgresql://localhost/bench
+    python -m benchmarks compare results.json baseline.json --threshold 0.15
+
+`run` seeds each app (fyyur, trivia, coffee_shop, basic_auth, flask_recap)
+with a deterministic dataset of --scale rows (1k, 100k, 1M or a number) into
+a fresh SQLite file per app, or into --database-url. It then times every
+route through the Flask test client and through a threaded WSGI server, and
+writes throughput, p50/p95/p99 latency, queries per request and peak RSS to
+JSON. Each app runs in its own process. An app that cannot run in the
+chosen setup (fyyur needs Postgres) is recorded as skipped.
+
+`compare` exits with status 1 when a route's p95 latency grew, or its
+throughput fell, by more than --threshold against the baseline file. A
+baseline app or route missing from the results, an app that failed, or an
+app skipped there but not in the baseline, counts as a regression too.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from .harness import QueryCounter, Server, run_client, run_server
+from .suites import ROOT, SUITES, Unsupported
+
+SCALES = {'1k': 1000, '100k': 100000, '1m': 1000000}
+
+
+def parse_scale(value):
+    try:
+        return SCALES.get(value.lower()) or int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError('scale must be 1k, 100k, 1M or a number of rows')
+
+
+def run_suite(args):
+    """Seed and measure one app; runs in a child process started by run()."""
+    directory, suite = SUITES[args.app]
+    os.chdir(os.path.join(ROOT, directory))
+    sys.path.insert(0, os.getcwd())
+    sys.path.insert(0, ROOT)
+    rng = random.Random(args.seed)
+    counter = QueryCounter()
+
+    result = {'rows': args.rows, 'routes': {}}
+    started = time.perf_counter()
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            app, routes = suite(args.database_url, args.rows, rng)
+    except Unsupported as error:
+        result['skipped'] = str(error)
+        return result
+    result['seed_seconds'] = round(time.perf_counter() - started, 2)
+
+    with Server(app) as server, open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for route in routes:
+            result['routes'][route.name] = {
+                'client': run_client(app, route, args.requests, rng, counter),
+                'server': run_server(server, route, args.requests, args.concurrency, rng, counter),
+            }
+    return result
+
+
+def run(args):
+    apps = args.apps.split(',') if args.apps else list(SUITES)
+    unknown = set(apps) - set(SUITES)
+    if unknown:
+        sys.exit('unknown app: {}'.format(', '.join(sorted(unknown))))
+
+    report = {
+        'meta': {
+            'created': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'rows': args.scale,
+            'seed': args.seed,
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'database': 'postgres' if args.database_url else 'sqlite',
+        },
+        'apps': {},
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        for app in apps:
+            database_url = args.database_url or 'sqlite:///{}'.format(os.path.join(workdir, app + '.db'))
+            part = os.path.join(workdir, app + '.json')
+            command = [sys.executable, '-m', 'benchmarks', '_suite', app, part,
+                       '--rows', str(args.scale), '--seed', str(args.seed), '--database-url', database_url,
+                       '--requests', str(args.requests), '--concurrency', str(args.concurrency)]
+            print('{}: {:,} rows'.format(app, args.scale), file=sys.stderr)
+            completed = subprocess.run(command, cwd=ROOT, env=dict(os.environ, BENCH_WORKDIR=workdir))
+            if completed.returncode or not os.path.exists(part):
+                report['apps'][app] = {'failed': 'exit status {}'.format(completed.returncode)}
+                continue
+            with open(part) as f:
+                report['apps'][app] = json.load(f)
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print_report(report)
+    if any('failed' in result for result in report['apps'].values()):
+        sys.exit(1)
+
+
+def print_report(report):
+    print('{:<12} {:<32} {:<6} {:>9} {:>9} {:>9} {:>9} {:>8} {:>10}'.format(
+        'app', 'route', 'mode', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms', 'queries', 'rss MB'))
+    for app, result in sorted(report['apps'].items()):
+        if 'failed' in result:
+            print('{:<12} FAILED: {}'.format(app, result['failed']))
+            continue
+        if 'skipped' in result:
+            print('{:<12} SKIPPED: {}'.format(app, result['skipped']))
+            continue
+        for route, modes in result['routes'].items():
+            for mode, stats in sorted(modes.items()):
+                print('{:<12} {:<32} {:<6} {:>9.0f} {:>9.2f} {:>9.2f} {:>9.2f} {:>8.1f} {:>10.0f}'.format(
+                    app, route, mode, stats['throughput_rps'], stats['p50_ms'], stats['p95_ms'], stats['p99_ms'],
+                    stats['queries_per_request'], stats['peak_rss_kb'] / 1024))
+
+
+def compare(args):
+    with open(args.results) as f:
+        results = json.load(f)
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+
+    regressions = []
+    for app, expected in baseline['apps'].items():
+        actual = results['apps'].get(app)
+        if actual is None:
+            regressions.append((app, '-', '-', 'app', 'measured', 'missing'))
+            continue
+        status = 'failed' if 'failed' in actual else 'skipped' if 'skipped' in actual else None
+        if status:
+            # an app skipped in both runs was never measurable in this setup
+            if status == 'failed' or status not in expected:
+                regressions.append((app, '-', '-', 'app', 'measured', '{}: {}'.format(status, actual[status])))
+            continue
+        for route, modes in expected.get('routes', {}).items():
+            for mode, before in modes.items():
+                after = actual.get('routes', {}).get(route, {}).get(mode)
+                if after is None:
+                    regressions.append((app, route, mode, 'route', 'measured', 'missing'))
+                    continue
+                if before['p95_ms'] and after['p95_ms'] > before['p95_ms'] * (1 + args.threshold):
+                    regressions.append((app, route, mode, 'p95_ms', before['p95_ms'], after['p95_ms']))
+                if after['throughput_rps'] < before['throughput_rps'] * (1 - args.threshold):
+                    regressions.append((app, route, mode, 'throughput_rps',
+                                        before['throughput_rps'], after['throughput_rps']))
+                if after['errors'] > before['errors']:
+                    regressions.append((app, route, mode, 'errors', before['errors'], after['errors']))
+
+    for app, route, mode, metric, before, after in regressions:
+        print('REGRESSION {} {} [{}] {}: {} -> {}'.format(app, route, mode, metric, before, after))
+    if regressions:
+        sys.exit(1)
+    print('no regressions beyond {:.0%}'.format(args.threshold))
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    run_parser = commands.add_parser('run', help='seed the apps and measure their routes')
+    run_parser.add_argument('--apps', help='comma-separated subset of: ' + ', '.join(SUITES))
+    run_parser.add_argument('--scale', type=parse_scale, default=1000, help='1k, 100k, 1M or a number of rows')
+    run_parser.add_argument('--database-url', help='Postgres URL to seed instead of a SQLite file per app')
+    run_parser.add_argument('--requests', type=int, default=200, help='requests per route and mode')
+    run_parser.add_argument('--concurrency', type=int, default=8, help='client threads against the server')
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--output', default='benchmark-results.json')
+
+    compare_parser = commands.add_parser('compare', help='fail on regressions against a baseline')
+    compare_parser.add_argument('results')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('--threshold', type=float, default=0.10)
+
+    suite_parser = commands.add_parser('_suite')
+    suite_parser.add_argument('app', choices=sorted(SUITES))
+    suite_parser.add_argument('output')
+    suite_parser.add_argument('--rows', type=int, required=True)
+    suite_parser.add_argument('--seed', type=int, required=True)
+    suite_parser.add_argument('--database-url', required=True)
+    suite_parser.add_argument('--requests', type=int, required=True)
+    suite_parser.add_argument('--concurrency', type=int, required=True)
+
+    args = parser.parse_args()
+    if args.command == 'run':
+        run(args)
+    elif args.command == 'compare':
+        compare(args)
+    else:
+        result = run_suite(args)
+        with open(args.output, 'w') as f:
+            json.dump(result, f)
+
+
+if __name__ == '__main__':
+    main()
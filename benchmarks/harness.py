@@ -0,0 +1,155 @@
+"""Route measurement shared by every benchmark suite.
+
+A Route is one request to time, with an optional JSON body or form. Its
+path, body, form and headers may be callables taking a random.Random, so
+each request can pick a different id from the seeded data. run_client()
+sends the requests one after another through the Flask test client.
+run_server() serves the app with a threaded werkzeug WSGI server on a free
+port and sends them over HTTP from several threads. Both return the same
+summary:
+
+    requests, errors, throughput_rps, p50_ms, p95_ms, p99_ms,
+    queries_per_request, peak_rss_kb
+
+Queries are counted with a SQLAlchemy cursor event on every engine in the
+process. Peak RSS is the process high-water mark after the route ran, so it
+only grows from one route to the next.
+"""
+import json
+import resource
+import sys
+import threading
+import time
+from collections import namedtuple
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+Route = namedtuple('Route', 'name method path body form headers')
+Route.__new__.__defaults__ = (None, None, None)
+
+
+def resolve(value, rng):
+    return value(rng) if callable(value) else value
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))] if samples else 0.0
+
+
+def peak_rss_kb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes on Linux
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+class QueryCounter:
+    """Statements executed by any SQLAlchemy engine in this process."""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+        try:
+            from sqlalchemy import event
+            from sqlalchemy.engine import Engine
+        except ImportError:
+            return
+        event.listen(Engine, 'after_cursor_execute', self._executed)
+
+    def _executed(self, *args):
+        with self._lock:
+            self.count += 1
+
+
+def summarize(samples, errors, elapsed, queries):
+    requests = len(samples) + errors
+    return {
+        'requests': requests,
+        'errors': errors,
+        'throughput_rps': round(requests / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(samples, 50), 3),
+        'p95_ms': round(percentile(samples, 95), 3),
+        'p99_ms': round(percentile(samples, 99), 3),
+        'queries_per_request': round(queries / requests, 2) if requests else 0.0,
+        'peak_rss_kb': peak_rss_kb(),
+    }
+
+
+def run_client(app, route, requests, rng, counter):
+    client = app.test_client()
+    samples, errors = [], 0
+    queries = counter.count
+    started = time.perf_counter()
+    for _ in range(requests):
+        path, body, form, headers = (resolve(value, rng) for value in route[2:])
+        request_started = time.perf_counter()
+        response = client.open(path, method=route.method, json=body, data=form, headers=headers)
+        elapsed = time.perf_counter() - request_started
+        if response.status_code >= 400:
+            errors += 1
+        else:
+            samples.append(elapsed * 1000)
+    return summarize(samples, errors, time.perf_counter() - started, counter.count - queries)
+
+
+class Server:
+    """A threaded werkzeug WSGI server for app on a free local port."""
+
+    def __init__(self, app):
+        from werkzeug.serving import WSGIRequestHandler, make_server
+
+        class QuietHandler(WSGIRequestHandler):
+            def log_request(self, *args, **kwargs):
+                pass
+
+        self._server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietHandler)
+        self.url = 'http://127.0.0.1:{}'.format(self._server.server_port)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def run_server(server, route, requests, concurrency, rng, counter):
+    lock = threading.Lock()
+    samples, errors = [], [0]
+    # draw every request up front so the client threads share no generator
+    planned = [tuple(resolve(value, rng) for value in route[2:]) for _ in range(requests)]
+
+    def client(start):
+        for path, body, form, headers in planned[start::concurrency]:
+            request = Request(server.url + path, method=route.method, headers=dict(headers or {}))
+            if body is not None:
+                request.data = json.dumps(body).encode('utf-8')
+                request.add_header('Content-Type', 'application/json')
+            elif form is not None:
+                request.data = urlencode(form).encode('utf-8')
+                request.add_header('Content-Type', 'application/x-www-form-urlencoded')
+            request_started = time.perf_counter()
+            try:
+                with urlopen(request, timeout=60) as response:
+                    response.read()
+                failed = False
+            except (HTTPError, URLError, OSError):
+                failed = True
+            elapsed = time.perf_counter() - request_started
+            with lock:
+                if failed:
+                    errors[0] += 1
+                else:
+                    samples.append(elapsed * 1000)
+
+    queries = counter.count
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(samples, errors[0], time.perf_counter() - started, counter.count - queries)
@@ -0,0 +1,216 @@
+"""Seeded datasets and routes for each Flask app in the repository.
+
+Every suite is a function (database_url, rows, rng) returning (app, routes).
+It is run in a process of its own, with the project directory first on
+sys.path and as the working directory, since the projects share top-level
+module names (app, models). `rows` sizes the app's main table; the other
+tables are derived from it, and all values come from rng, so a seed gives
+the same dataset every time.
+"""
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+from .harness import Route
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BATCH_SIZE = 5000
+
+
+class Unsupported(Exception):
+    pass
+
+
+def insert_batches(db, table, rows):
+    for start in range(0, len(rows), BATCH_SIZE):
+        db.session.execute(table.insert(), rows[start:start + BATCH_SIZE])
+    db.session.commit()
+
+
+def fyyur(database_url, rows, rng):
+    """rows shows, rows / 50 artists and rows / 100 venues."""
+    if not database_url.startswith('postgres'):
+        raise Unsupported('fyyur needs Postgres (ARRAY columns)')
+    os.environ['DATABASE_URL'] = database_url
+    from app import app, db, Venue, Artist, Show, recount_upcoming_shows
+    from forms import genres_choices, state_choices
+
+    genres = [value for value, _ in genres_choices]
+    states = [value for value, _ in state_choices]
+
+    def entity(i, kind):
+        return {
+            'name': '{} {}'.format(kind, i),
+            'city': 'City {}'.format(rng.randrange(200)),
+            'state': rng.choice(states),
+            'genres': rng.sample(genres, rng.randint(1, 3)),
+        }
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        insert_batches(db, Venue.__table__, [entity(i, 'Venue') for i in range(max(10, rows // 100))])
+        insert_batches(db, Artist.__table__, [entity(i, 'Artist') for i in range(max(10, rows // 50))])
+        venue_ids = [row.id for row in db.session.query(Venue.id).order_by(Venue.id)]
+        artist_ids = [row.id for row in db.session.query(Artist.id).order_by(Artist.id)]
+        now = datetime.now()
+        insert_batches(db, Show.__table__, [{
+            'venue_id': rng.choice(venue_ids),
+            'artist_id': rng.choice(artist_ids),
+            'start_time': now + timedelta(hours=rng.randint(-24 * 365, 24 * 365)),
+        } for _ in range(rows)])
+        recount_upcoming_shows(now)
+        db.session.commit()
+
+    return app, [
+        Route('GET /venues', 'GET', '/venues'),
+        Route('GET /venues/<id>', 'GET', lambda rng: '/venues/{}'.format(rng.choice(venue_ids))),
+        Route('GET /artists', 'GET', '/artists'),
+        Route('GET /artists/<id>', 'GET', lambda rng: '/artists/{}'.format(rng.choice(artist_ids))),
+        Route('GET /shows', 'GET', '/shows'),
+        Route('POST /venues/search', 'POST', '/venues/search',
+              form=lambda rng: {'search_term': 'venue {}'.format(rng.randrange(10))}),
+        Route('POST /artists/search', 'POST', '/artists/search',
+              form=lambda rng: {'search_term': 'artist {}'.format(rng.randrange(10))}),
+    ]
+
+
+def trivia(database_url, rows, rng):
+    """rows questions in the six trivia categories."""
+    import flaskr
+    from models import setup_db, db, Question, Category
+
+    def bind(app):
+        with app.app_context():
+            setup_db(app, database_url)
+    # create_app() binds the default trivia database; bind the benchmark one instead
+    flaskr.setup_db = bind
+    app = flaskr.create_app()
+
+    categories = ['Science', 'Art', 'Geography', 'History', 'Entertainment', 'Sports']
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        insert_batches(db, Category.__table__, [
+            {'id': id, 'type': type} for id, type in enumerate(categories, 1)])
+        insert_batches(db, Question.__table__, [{
+            'question': 'Question {} about {}?'.format(i, rng.choice(categories).lower()),
+            'answer': 'Answer {}'.format(i),
+            'difficulty': rng.randint(1, 5),
+            'category': str(rng.randint(1, len(categories))),
+        } for i in range(rows)])
+
+    pages = max(1, rows // flaskr.QUESTIONS_PER_PAGE)
+    return app, [
+        Route('GET /categories', 'GET', '/categories'),
+        Route('GET /questions', 'GET', '/questions'),
+        Route('GET /questions?page=<n>', 'GET', lambda rng: '/questions?page={}'.format(rng.randint(1, pages))),
+        Route('GET /questions?after=<id>', 'GET',
+              lambda rng: '/questions?after={}'.format(rng.randrange(max(1, rows - flaskr.QUESTIONS_PER_PAGE)))),
+        Route('GET /categories/<id>/questions', 'GET',
+              lambda rng: '/categories/{}/questions'.format(rng.randint(1, len(categories)))),
+        Route('POST /questions (search)', 'POST', '/questions',
+              body=lambda rng: {'searchTerm': rng.choice(categories).lower()}),
+        Route('POST /quizzes', 'POST', '/quizzes', body=lambda rng: {
+            'previous_questions': [rng.randrange(rows) for _ in range(5)],
+            'quiz_category': {'id': rng.randint(0, len(categories))},
+        }),
+    ]
+
+
+def fake_identity_provider(audience, issuer, users):
+    """A running FakeJWKSServer and one signed token per user."""
+    sys.path.append(os.path.join(ROOT, 'BasicFlaskAuth'))
+    from fake_jwks import FakeJWKSServer
+
+    idp = FakeJWKSServer().start()
+    idp.publish('key-1')
+    permissions = ['get:drinks-detail', 'post:drinks', 'patch:drinks', 'delete:drinks']
+    tokens = [idp.token('key-1', {
+        'sub': 'user-{}'.format(n),
+        'aud': audience,
+        'iss': issuer,
+        'exp': int(time.time()) + 24 * 3600,
+        'permissions': permissions,
+    }) for n in range(users)]
+    return idp, tokens
+
+
+def coffee_shop(database_url, rows, rng):
+    """rows drinks; /drinks-detail with tokens from a local fake identity provider."""
+    from src.database import models
+    models.database_path = database_url
+    from src.api import app
+    from src.auth import auth
+    from src.auth.jwks_cache import JWKSCache
+
+    colors = ['brown', 'white', 'black', 'grey', 'tan']
+    with app.app_context():
+        models.db_drop_and_create_all()
+        insert_batches(models.db, models.Drink.__table__, [{
+            'title': 'drink {}'.format(i),
+            'recipe': json.dumps([
+                {'name': 'part {}'.format(n), 'color': rng.choice(colors), 'parts': rng.randint(1, 3)}
+                for n in range(rng.randint(1, 3))
+            ]),
+        } for i in range(rows)])
+
+    # signing is slow; a few hundred users is enough to exercise the token cache
+    idp, tokens = fake_identity_provider(auth.API_AUDIENCE, 'https://{}/'.format(auth.AUTH0_DOMAIN), min(rows, 200))
+    auth.jwks = JWKSCache(idp.url)
+    return app, [
+        Route('GET /drinks', 'GET', '/drinks'),
+        Route('GET /drinks-detail', 'GET', '/drinks-detail',
+              headers=lambda rng: {'Authorization': 'Bearer ' + rng.choice(tokens)}),
+    ]
+
+
+def basic_auth(database_url, rows, rng):
+    """GET /headers with tokens for min(rows, 200) users from a local fake identity provider."""
+    import types
+    from jwks_cache import JWKSCache
+
+    domain, audience = 'bench.local', 'bench'
+    # app.py is a follow-along template: fill in its placeholders and load it
+    with open('app.py') as f:
+        source = f.read() \
+            .replace('@TODO_REPLACE_WITH_YOUR_DOMAIN', repr(domain)) \
+            .replace('@TODO_REPLACE_WITH_YOUR_API_AUDIENCE', repr(audience))
+    module = types.ModuleType('app')
+    module.__file__ = os.path.abspath('app.py')
+    exec(compile(source, module.__file__, 'exec'), module.__dict__)
+
+    idp, tokens = fake_identity_provider(audience, 'https://{}/'.format(domain), min(rows, 200))
+    module.jwks = JWKSCache(idp.url)
+    return module.app, [
+        Route('GET /headers', 'GET', '/headers',
+              headers=lambda rng: {'Authorization': 'Bearer ' + rng.choice(tokens)}),
+    ]
+
+
+def flask_recap(database_url, rows, rng):
+    """rows greetings in a fresh greetings log."""
+    log = os.path.join(os.environ['BENCH_WORKDIR'], 'greetings.log')
+    with open(log, 'w') as f:
+        for i in range(rows):
+            f.write(json.dumps({'lang': 'lang{}'.format(i), 'greeting': 'greeting {}'.format(rng.random())}) + '\n')
+    os.environ['GREETINGS_LOG'] = log
+    from FlaskRecap import app
+
+    return app, [
+        Route('GET /greeting', 'GET', '/greeting'),
+        Route('GET /greeting/<lang>', 'GET', lambda rng: '/greeting/lang{}'.format(rng.randrange(rows))),
+        Route('POST /greeting', 'POST', '/greeting',
+              body=lambda rng: {'lang': 'lang{}'.format(rng.randrange(rows)), 'greeting': 'hi'}),
+    ]
+
+
+SUITES = {
+    'fyyur': ('projects/01_fyyur/starter_code', fyyur),
+    'trivia': ('projects/02_trivia_api/starter/backend', trivia),
+    'coffee_shop': ('projects/03_coffee_shop_full_stack/starter_code/backend', coffee_shop),
+    'basic_auth': ('BasicFlaskAuth', basic_auth),
+    'flask_recap': ('FlaskRecap', flask_recap),
+}
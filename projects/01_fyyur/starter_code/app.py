@@ -3,9 +3,9 @@
 #----------------------------------------------------------------------------#
 
 import json
+import base64
 import dateutil.parser
-import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for
+from flask import Flask, render_template, request, Response, flash, redirect, url_for, abort, stream_with_context, jsonify
 from flask_moment import Moment
 from flask_sqlalchemy import SQLAlchemy
 import logging
@@ -13,7 +13,23 @@ from logging import Formatter, FileHandler
 from flask_wtf import Form
 from forms import *
 from flask_migrate import Migrate
-from sqlalchemy import func
+from sqlalchemy import func, tuple_, or_, select, cast, event, DDL
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import IntegrityError
+from search_index import SearchIndex
+from facets import FacetIndex
+from cache import create_cache, DatabaseGeneration
+from show_counters import UpcomingShowSweeper
+from bulk import fyyur_cli
+from synthetic import generate_data
+from instrumentation import SQLInstrumentation
+from formatting import format_datetime
+from db_pool import pool_metrics
+from scheduling import BookingCalendar
+from datetime import timedelta
+from collections import Counter
+import click
+import time
 import sys
 #----------------------------------------------------------------------------#
 # App Config.
@@ -23,15 +39,26 @@ app = Flask(__name__)
 moment = Moment(app)
 app.config.from_object('config')
 db = SQLAlchemy(app)
+# the trigram indexes on "name" need pg_trgm, also for db.create_all()
+event.listen(db.metadata, 'before_create', DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql'))
 
 # TODO: connect to a local postgresql database
 migrate = Migrate(app,db)
+fyyur_cli.add_command(generate_data)
+app.cli.add_command(fyyur_cli)
+instrumentation = SQLInstrumentation(app)
+instrumentation.add_collector(pool_metrics)
 #----------------------------------------------------------------------------#
 # Models.
 #----------------------------------------------------------------------------#
 
 class Venue(db.Model):
     __tablename__ = 'Venue'
+    __table_args__ = (
+      db.Index('ix_Venue_genres', 'genres', postgresql_using='gin'),
+      db.Index('ix_Venue_state_city', 'state', 'city', 'id'),
+      db.Index('ix_Venue_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
@@ -45,6 +72,7 @@ class Venue(db.Model):
     website = db.Column(db.String(120))
     seeking_talent = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(500))
+    upcoming_show_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     shows = db.relationship('Show', backref="Venue", lazy=True)
     def __repr__(self):
       return '<Venue name:{}>'.format(self.name)
@@ -53,6 +81,10 @@ class Venue(db.Model):
 
 class Artist(db.Model):
     __tablename__ = 'Artist'
+    __table_args__ = (
+      db.Index('ix_Artist_genres', 'genres', postgresql_using='gin'),
+      db.Index('ix_Artist_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
@@ -65,6 +97,7 @@ class Artist(db.Model):
     facebook_link = db.Column(db.String(120))
     seeking_venue = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(500))
+    upcoming_show_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     shows = db.relationship('Show', backref="Artist", lazy=True)
 
 
@@ -77,6 +110,10 @@ class Artist(db.Model):
 
 class Show(db.Model):
   __tablename__ = 'Show'
+  __table_args__ = (
+    db.Index('ix_Show_venue_id_start_time', 'venue_id', 'start_time'),
+    db.Index('ix_Show_artist_id_start_time', 'artist_id', 'start_time'),
+  )
 
   id = db.Column(db.Integer, primary_key=True)
   artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id'), nullable=False)
@@ -87,20 +124,396 @@ class Show(db.Model):
   def __repr__(self):
     return '<Show artist:{} venue:{} start date and time: {}'.format(self.artist_id,self.venue_id,self.start_time)
 
+class Area(db.Model):
+  # summary of the venues of one (state, city), kept current by the venue
+  # write handlers and the upcoming show counters; see count_areas().
+  __tablename__ = 'Area'
+
+  state = db.Column(db.String(120), primary_key=True)
+  city = db.Column(db.String(120), primary_key=True)
+  venue_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+  upcoming_show_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+  def __repr__(self):
+    return '<Area {}, {} venues:{}>'.format(self.city, self.state, self.venue_count)
+
+class ImportCheckpoint(db.Model):
+  # rows of a file done by `flask fyyur import`, written in the transaction
+  # of each chunk; see bulk.py.
+  __tablename__ = 'ImportCheckpoint'
+
+  name = db.Column(db.String(500), primary_key=True)
+  rows = db.Column(db.Integer, nullable=False)
+
+class ImportedId(db.Model):
+  # database id of a venue or artist imported under a partner's id
+  __tablename__ = 'ImportedId'
+
+  entity = db.Column(db.String(16), primary_key=True)
+  source_id = db.Column(db.String(120), primary_key=True)
+  id = db.Column(db.Integer, nullable=False)
+
+class CacheGeneration(db.Model):
+  # one row, bumped by every cache invalidation so that the per-process
+  # caches of the other workers drop their entries; see cache.py.
+  __tablename__ = 'CacheGeneration'
+
+  id = db.Column(db.Integer, primary_key=True)
+  generation = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
 #----------------------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format)
-
 app.jinja_env.filters['datetime'] = format_datetime
 
+#----------------------------------------------------------------------------#
+# Upcoming show counters.
+#----------------------------------------------------------------------------#
+
+def parse_start_time(value):
+  # a time with an offset or Z is converted to the naive local time that
+  # Show.start_time and datetime.now() use, so they can be compared
+  start_time = dateutil.parser.parse(str(value))
+  if start_time.tzinfo is not None:
+    start_time = start_time.astimezone().replace(tzinfo=None)
+  return start_time
+
+def count_upcoming_show(venue_id, artist_id, delta):
+  db.session.query(Venue).filter(Venue.id == venue_id) \
+    .update({Venue.upcoming_show_count: Venue.upcoming_show_count + delta}, synchronize_session=False)
+  db.session.query(Artist).filter(Artist.id == artist_id) \
+    .update({Artist.upcoming_show_count: Artist.upcoming_show_count + delta}, synchronize_session=False)
+  count_area_upcoming_shows({int(venue_id): delta})
+
+def add_upcoming_show_counts(venues, artists):
+  # venues and artists map ids to a count delta, one UPDATE per distinct id
+  for model, counts in ((Venue, venues), (Artist, artists)):
+    for entity_id, delta in counts.items():
+      db.session.query(model).filter(model.id == entity_id) \
+        .update({model.upcoming_show_count: model.upcoming_show_count + delta}, synchronize_session=False)
+  count_area_upcoming_shows(venues)
+
+def recount_upcoming_shows(now):
+  for model, column in ((Venue, Show.venue_id), (Artist, Show.artist_id)):
+    upcoming = db.session.query(func.count(Show.id)) \
+      .filter(column == model.id) \
+      .filter(Show.start_time > now) \
+      .scalar_subquery()
+    db.session.query(model).update({model.upcoming_show_count: upcoming}, synchronize_session=False)
+  refresh_areas()
+
+@app.cli.command('sweep-upcoming-shows')
+@click.option('--interval', default=60, help='Seconds between sweeps.')
+@click.option('--recount-every', default=1440, help='Sweeps between full recounts.')
+@click.option('--once', is_flag=True, help='Recount, sweep once and exit.')
+def sweep_upcoming_shows(interval, recount_every, once):
+  """Decrement upcoming show counters as shows move into the past."""
+  sweeper = None
+  sweeps = 0
+  since = None
+  while True:
+    now = datetime.now()
+    recounted = sweeper is None or sweeps % recount_every == 0
+    if recounted:
+      # a full recount corrects anything missed while no sweeper was running
+      recount_upcoming_shows(now)
+      sweeper = UpcomingShowSweeper()
+      since = now
+    new_shows = db.session.query(Show.id, Show.start_time, Show.venue_id, Show.artist_id) \
+      .filter(Show.id > sweeper.last_show_id) \
+      .filter(Show.start_time > since) \
+      .yield_per(1000)
+    for show in new_shows:
+      sweeper.push(show.id, show.start_time, show.venue_id, show.artist_id)
+
+    venues, artists = sweeper.pop_due(now)
+    add_upcoming_show_counts({i: -count for i, count in venues.items()}, {i: -count for i, count in artists.items()})
+    db.session.commit()
+    if recounted:
+      # any page may show a corrected counter
+      cache.clear()
+    elif venues:
+      cache.invalidate('Show', *['Venue:{}'.format(i) for i in venues] + ['Artist:{}'.format(i) for i in artists])
+
+    sweeps += 1
+    since = now
+    if once:
+      break
+    time.sleep(interval)
+
+#----------------------------------------------------------------------------#
+# Area summary.
+#----------------------------------------------------------------------------#
+
+# the Area table holds one row per (state, city) with venues, with the number
+# of venues and the sum of their upcoming show counters. /venues pages
+# through it and joins the venues of each area on ix_Venue_state_city, so the
+# listing never groups the venue table. Writes update it in the same
+# transaction; `flask refresh-areas` rebuilds it after bulk loads.
+
+def count_areas(deltas):
+  # deltas maps (state, city) to a (venues, upcoming shows) delta. A missing
+  # area is inserted, an area left without venues is removed.
+  emptied = []
+  for (state, city), (venues, upcoming) in deltas.items():
+    if state is None or city is None or (venues, upcoming) == (0, 0):
+      continue
+    area = db.session.query(Area).filter(Area.state == state, Area.city == city)
+    values = {Area.venue_count: Area.venue_count + venues, Area.upcoming_show_count: Area.upcoming_show_count + upcoming}
+    if not area.update(values, synchronize_session=False):
+      try:
+        with db.session.begin_nested():
+          db.session.add(Area(state=state, city=city, venue_count=venues, upcoming_show_count=upcoming))
+      except IntegrityError:
+        # another request created the area first
+        area.update(values, synchronize_session=False)
+    if venues < 0:
+      emptied.append((state, city))
+  if emptied:
+    db.session.query(Area) \
+      .filter(tuple_(Area.state, Area.city).in_(emptied)) \
+      .filter(Area.venue_count <= 0) \
+      .delete(synchronize_session=False)
+
+def count_area_upcoming_shows(venues):
+  # venues maps venue ids to an upcoming show delta
+  venues = {venue_id: delta for venue_id, delta in venues.items() if delta}
+  if not venues:
+    return
+  deltas = Counter()
+  for row in db.session.query(Venue.id, Venue.state, Venue.city).filter(Venue.id.in_(venues)):
+    deltas[(row.state, row.city)] += venues[row.id]
+  count_areas({area: (0, delta) for area, delta in deltas.items()})
+
+def refresh_areas():
+  # rebuilds every area from the venue table in the current transaction;
+  # readers keep seeing the previous rows until it commits.
+  db.session.query(Area).delete(synchronize_session=False)
+  summary = select(Venue.state, Venue.city, func.count(Venue.id), func.coalesce(func.sum(Venue.upcoming_show_count), 0)) \
+    .where(Venue.state.isnot(None), Venue.city.isnot(None)) \
+    .group_by(Venue.state, Venue.city)
+  db.session.execute(Area.__table__.insert().from_select(['state', 'city', 'venue_count', 'upcoming_show_count'], summary))
+
+@app.cli.command('refresh-areas')
+@click.option('--interval', default=0, help='Seconds between refreshes, 0 to refresh once.')
+def refresh_areas_command(interval):
+  """Rebuild the /venues area summary, e.g. after loading venues outside the app."""
+  while True:
+    started = time.perf_counter()
+    refresh_areas()
+    db.session.commit()
+    cache.invalidate('Venue')
+    click.echo('{} areas refreshed in {:.2f}s'.format(db.session.query(Area).count(), time.perf_counter() - started))
+    if not interval:
+      break
+    time.sleep(interval)
+
+#----------------------------------------------------------------------------#
+# Cache.
+#----------------------------------------------------------------------------#
+
+# assembled view data of the read routes, tagged with the entities it was
+# built from. Write handlers invalidate the tags they touch: 'Venue:<id>' for
+# one row, 'Venue' for listings over the whole table. The memory backend
+# checks CacheGeneration on every hit, so invalidations made by other
+# workers and by the `flask` commands reach it too.
+cache = create_cache(app.config, DatabaseGeneration(db, CacheGeneration))
+
+def cached_view(key, build):
+  data = cache.get(key)
+  if data is None:
+    data, tags = build()
+    cache.set(key, data, tags)
+  return data
+
+#----------------------------------------------------------------------------#
+# Pagination.
+#----------------------------------------------------------------------------#
+
+def encode_cursor(values):
+  raw = json.dumps(values, default=lambda value: value.isoformat())
+  return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def decode_cursor(token, parsers):
+  if not token:
+    return None
+  try:
+    values = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    if len(values) != len(parsers):
+      raise ValueError(token)
+    return tuple(parse(value) for parse, value in zip(parsers, values))
+  except (ValueError, TypeError):
+    abort(400)
+
+def keyset_page(query, columns, parsers, page_size):
+  # keyset ("seek") pagination on a unique, ordered tuple of columns. The
+  # `after` and `before` request arguments carry the cursor of the last row of
+  # the previous page or the first row of the next one.
+  key = tuple_(*columns)
+  before = decode_cursor(request.args.get('before'), parsers)
+  after = decode_cursor(request.args.get('after'), parsers)
+
+  if before is not None:
+    rows = query.filter(key < tuple_(*before)) \
+      .order_by(*[column.desc() for column in columns]) \
+      .limit(page_size + 1) \
+      .all()
+    has_more = len(rows) > page_size
+    rows = rows[:page_size][::-1]
+    has_prev, has_next = has_more, True
+  else:
+    if after is not None:
+      query = query.filter(key > tuple_(*after))
+    rows = query.order_by(*columns).limit(page_size + 1).all()
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    has_prev, has_next = after is not None, has_more
+
+  cursor = lambda row: encode_cursor([getattr(row, column.key) for column in columns])
+  return rows, {
+    "prev": cursor(rows[0]) if rows and has_prev else None,
+    "next": cursor(rows[-1]) if rows and has_next else None
+  }
+
+def stream_template(template_name, **context):
+  # renders the template lazily so that rows fetched through yield_per are
+  # written to the client as they arrive instead of being held in memory.
+  app.update_template_context(context)
+  template = app.jinja_env.get_template(template_name)
+  return Response(stream_with_context(template.generate(context)))
+
+#----------------------------------------------------------------------------#
+# Search.
+#----------------------------------------------------------------------------#
+
+def search_by_name(model, search_term, limit, offset):
+  # case-insensitive substring match pushed into the database, where the
+  # pg_trgm indexes on "name" can serve it. Matches are counted up to
+  # SEARCH_COUNT_LIMIT only, so a short term does not count the whole table;
+  # count_capped tells the template to show the count as a lower bound.
+  pattern = '%{}%'.format(search_term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_'))
+  matches = db.session.query(model.id).filter(model.name.ilike(pattern, escape='\\'))
+  rows = matches.with_entities(model.id, model.name, model.upcoming_show_count.label('num_upcoming_shows')) \
+    .order_by(model.name, model.id) \
+    .limit(limit) \
+    .offset(offset) \
+    .all()
+  cap = app.config['SEARCH_COUNT_LIMIT']
+  count = db.session.query(func.count()).select_from(matches.limit(cap + 1).subquery()).scalar()
+
+  return {
+    "count": min(count, cap),
+    "count_capped": count > cap,
+    "data": [{
+      "id": row.id,
+      "name": row.name,
+      "num_upcoming_shows": row.num_upcoming_shows
+    } for row in rows]
+  }
+
+def search_by_ids(model, index, ids, limit, offset, count=None):
+  # used with the in-memory indexes: the page of ids is already known, only
+  # the names and upcoming show counts are read from the database. count is
+  # the number of matches, len(ids) unless ids is only the page.
+  page = ids[offset:offset + limit]
+  counts = {}
+  if page:
+    rows = db.session.query(model.id, model.name, model.upcoming_show_count.label('num_upcoming_shows')) \
+      .filter(model.id.in_(page)) \
+      .all()
+    counts = {row.id: row for row in rows}
+  # ids deleted by another process since the last load are gone from the
+  # database; drop them from the index so count agrees with the rows
+  missing = [doc_id for doc_id in page if doc_id not in counts]
+  for doc_id in missing:
+    index.remove(doc_id)
+
+  return {
+    "count": (len(ids) if count is None else count) - len(missing),
+    "data": [{
+      "id": counts[doc_id].id,
+      "name": counts[doc_id].name,
+      "num_upcoming_shows": counts[doc_id].num_upcoming_shows
+    } for doc_id in page if doc_id in counts]
+  }
+
+venue_index = SearchIndex(app.config['MEMORY_INDEX_RELOAD_INTERVAL'])
+artist_index = SearchIndex(app.config['MEMORY_INDEX_RELOAD_INTERVAL'])
+
+def memory_index(index, model):
+  index.refresh(lambda: db.session.query(model.id, model.name, model.city, model.state, model.genres).yield_per(1000))
+  return index
+
+venue_facets = FacetIndex(('genres', 'state', 'seeking_talent'), app.config['MEMORY_INDEX_RELOAD_INTERVAL'])
+artist_facets = FacetIndex(('genres', 'state', 'seeking_venue'), app.config['MEMORY_INDEX_RELOAD_INTERVAL'])
+
+def memory_facets(index, model):
+  index.refresh(lambda: db.session.query(model.id, *[getattr(model, field) for field in index.fields]).yield_per(1000))
+  return index
+
+def search_paging():
+  limit = request.values.get('limit', app.config['SEARCH_RESULTS_PER_PAGE'], type=int)
+  offset = request.values.get('offset', 0, type=int)
+  return max(1, min(limit, 1000)), max(offset, 0)
+
+#----------------------------------------------------------------------------#
+# Discovery.
+#----------------------------------------------------------------------------#
+
+def discovery_clauses(flag):
+  # every `genre` and `state` argument is one clause and its comma separated
+  # values are alternatives: ?genre=Jazz,Blues&genre=Folk&state=CA is
+  # (Jazz or Blues) and Folk and CA. `flag` is seeking_talent or seeking_venue.
+  clauses = []
+  for argument, field in (('genre', 'genres'), ('state', 'state')):
+    for value in request.args.getlist(argument):
+      clauses.append((field, [item for item in value.split(',') if item]))
+  if flag in request.args:
+    value = request.args[flag].lower()
+    if value not in ('true', 'false', '1', '0'):
+      abort(400)
+    clauses.append((flag, [value in ('true', '1')]))
+  return clauses
+
+def discover_in_database(model, clauses, limit, offset):
+  # the same filters as SQL: genres with @> (one value, or every single
+  # valued clause at once) or && (alternatives), both served by the GIN
+  # index on genres.
+  query = db.session.query(model.id, model.name, model.upcoming_show_count.label('num_upcoming_shows'), func.count().over().label('total'))
+  required = []
+  for field, values in clauses:
+    column = getattr(model, field)
+    if field == 'genres' and len(values) == 1:
+      required.extend(values)
+    elif field == 'genres':
+      query = query.filter(column.op('&&')(cast(postgresql.array(values), column.type)))
+    else:
+      query = query.filter(column.in_(values))
+  if required:
+    query = query.filter(model.genres.op('@>')(cast(postgresql.array(required), model.genres.type)))
+  rows = query.order_by(model.id).limit(limit).offset(offset).all()
+
+  return {
+    "count": rows[0].total if rows else 0,
+    "data": [{
+      "id": row.id,
+      "name": row.name,
+      "num_upcoming_shows": row.num_upcoming_shows
+    } for row in rows]
+  }
+
+def discover(model, index, flag):
+  clauses = discovery_clauses(flag)
+  limit, offset = search_paging()
+  if app.config['DISCOVERY_BACKEND'] == 'memory':
+    count, ids = memory_facets(index, model).query(clauses, offset, limit)
+    response = search_by_ids(model, index, ids, limit, 0, count)
+  else:
+    response = discover_in_database(model, clauses, limit, offset)
+  response.update({"limit": limit, "offset": offset})
+  return jsonify(response)
+
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
@@ -118,27 +531,61 @@ def venues():
   # TODO: replace with real venues data.
   #       num_shows should be aggregated based on number of upcoming shows per venue.
 
-  data=[]
-  areas = db.session.query(func.count(Venue.id),Venue.state,Venue.city).group_by(Venue.state,Venue.city).all()
-  
-  for area in areas:
-    all_venues = db.session.query(Venue).filter_by(state=area.state).filter_by(city=area.city).all()
-    venues = []
-    for venue in all_venues:
-
-     venues.append({
-       "id": venue.id,
-       "name": venue.name,
-       "num_upcoming_shows": db.session.query(Show).filter(Show.venue_id==venue.id).filter(Show.start_time > datetime.now()).count()
-     }) 
+  def build():
+    # one statement: a keyset page of the Area summary, joined to the venues
+    # of each area through ix_Venue_state_city. `after` and `before` carry the
+    # (state, city) cursor of the last or first area of the adjacent page.
+    page_size = app.config['VENUE_AREAS_PER_PAGE']
+    key = tuple_(Area.state, Area.city)
+    before = decode_cursor(request.args.get('before'), [str, str])
+    after = decode_cursor(request.args.get('after'), [str, str])
+    areas = db.session.query(Area)
+    if before is not None:
+      areas = areas.filter(key < tuple_(*before)).order_by(Area.state.desc(), Area.city.desc())
+    else:
+      if after is not None:
+        areas = areas.filter(key > tuple_(*after))
+      areas = areas.order_by(Area.state, Area.city)
+    areas = areas.limit(page_size + 1).subquery()
+    rows = db.session.query(areas, Venue.id, Venue.name, Venue.upcoming_show_count.label('num_upcoming_shows')) \
+      .join(Venue, (Venue.state == areas.c.state) & (Venue.city == areas.c.city)) \
+      .order_by(areas.c.state, areas.c.city, Venue.id) \
+      .all()
+
+    data = []
+    area = None
+    for row in rows:
+      if area is None or area["state"] != row.state or area["city"] != row.city:
+        area = {
+          "city": row.city,
+          "state": row.state,
+          "num_venues": row.venue_count,
+          "num_upcoming_shows": row.upcoming_show_count,
+          "venues": []
+        }
+        data.append(area)
+
+      area["venues"].append({
+        "id": row.id,
+        "name": row.name,
+        "num_upcoming_shows": row.num_upcoming_shows
+      })
 
-    data.append({
-      "city": area.city,
-      "state": area.state,
-      "venues": venues 
-    })
+    has_more = len(data) > page_size
+    if before is not None:
+      data = data[1:] if has_more else data
+      has_prev, has_next = has_more, True
+    else:
+      data = data[:page_size]
+      has_prev, has_next = after is not None, has_more
+    pager = {
+      "prev": encode_cursor([data[0]["state"], data[0]["city"]]) if data and has_prev else None,
+      "next": encode_cursor([data[-1]["state"], data[-1]["city"]]) if data and has_next else None
+    }
+    return (data, pager), ['Venue', 'Show']
 
-  return render_template('pages/venues.html', areas=data);
+  data, pager = cached_view('venues?' + request.query_string.decode(), build)
+  return render_template('pages/venues.html', areas=data, pager=pager)
 
 @app.route('/venues/search', methods=['POST'])
 def search_venues():
@@ -146,87 +593,82 @@ def search_venues():
   # seach for Hop should return "The Musical Hop".
   # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
   search_term = request.form.get('search_term','')
-
-  search_term = search_term.casefold()
-  venues = db.session.query(Venue).all()
-  response = {}
-  data = []
-  upcoming_shows = []
-  past_shows = []
-  count = 0
-  for venue in venues:
-    name = venue.name
-    name = name.casefold()
-
-    if(name.rfind(search_term) > -1):
-      count += 1
-      data.append({
-        "id": venue.id,
-        "name": venue.name,
-        "num_upcoming_shows": db.session.query(Show).filter(Show.venue_id==venue.id).filter(Show.start_time > datetime.now()).count()
-      })
-
-  response= {
-    "count": count,
-    "data": data
-  }
+  limit, offset = search_paging()
+  if app.config['SEARCH_BACKEND'] == 'memory':
+    ids = memory_index(venue_index, Venue).search(search_term)
+    response = search_by_ids(Venue, venue_index, ids, limit, offset)
+  else:
+    response = search_by_name(Venue, search_term, limit, offset)
 
   return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
 
+@app.route('/venues/discover')
+def discover_venues():
+  # e.g. /venues/discover?genre=Jazz&state=CA&seeking_talent=true
+  return discover(Venue, venue_facets, 'seeking_talent')
+
 @app.route('/venues/<int:venue_id>')
 def show_venue(venue_id):
   # shows the venue page with the given venue_id
   # TODO: replace with real venue data from the venues table, using venue_id
 
-  venue = db.session.query(Venue).filter_by(id=venue_id).first()
-  
-  past_shows_list = db.session.query(Show).join(Artist).filter(Show.venue_id==venue_id).filter(Show.start_time<=datetime.now()).all()
-  upcoming_shows_list = db.session.query(Show).join(Artist).filter(Show.venue_id==venue_id).filter(Show.start_time>datetime.now()).all()
-  past_shows =[]
-  upcoming_shows = []
-
-  for show in upcoming_shows_list:
-    
-    
-    upcoming_shows.append({
-      "artist_id": show.Artist.id,
-      "artist_name": show.Artist.name,
-      "artist_image_link": show.Artist.image_link,
-      "start_time": show.start_time.strftime('%Y-%m-%d %H:%M:%S')
-    })
-
-  for show in past_shows_list:
-    past_shows.append({
-      "artist_id": show.Artist.id,
-      "artist_name": show.Artist.name,
-      "artist_image_link": show.Artist.image_link,
-      "start_time": show.start_time.strftime('%Y-%m-%d %H:%M:%S') 
-      })
-
- 
-  data ={
-      "id": venue.id,
-      "name":venue.name,
-      "genres":venue.genres,
-      "address":venue.address,
-      "city": venue.city,
-      "state":venue.state,
-      "phone":venue.phone,
-      "website":venue.website,
-      "facebook_link":venue.facebook_link,
-      "seeking_talent":venue.seeking_talent,
-      "seeking_description":venue.seeking_description,
-      "image_link": venue.image_link,
-      "past_shows":past_shows,
-      "upcoming_shows":upcoming_shows,
-      "num_past_shows": len(past_shows),
-      "num_upcoming_shows": len(upcoming_shows)
+  def build():
+    # the venue and every show with its artist come back in one statement;
+    # past and upcoming are split here against a single timestamp.
+    now = datetime.now()
+    rows = db.session.query(Venue, Show.start_time, Artist.id, Artist.name, Artist.image_link) \
+      .outerjoin(Show, Show.venue_id == Venue.id) \
+      .outerjoin(Artist, Artist.id == Show.artist_id) \
+      .filter(Venue.id == venue_id) \
+      .order_by(Show.start_time) \
+      .all()
+    if not rows:
+      abort(404)
+
+    venue = rows[0].Venue
+    past_shows = []
+    upcoming_shows = []
+
+    for row in rows:
+      if row.start_time is None:
+        continue
+      show = {
+        "artist_id": row.id,
+        "artist_name": row.name,
+        "artist_image_link": row.image_link,
+        "start_time": row.start_time
+      }
+      if row.start_time > now:
+        upcoming_shows.append(show)
+      else:
+        past_shows.append(show)
+
+    data ={
+        "id": venue.id,
+        "name":venue.name,
+        "genres":venue.genres,
+        "address":venue.address,
+        "city": venue.city,
+        "state":venue.state,
+        "phone":venue.phone,
+        "website":venue.website,
+        "facebook_link":venue.facebook_link,
+        "seeking_talent":venue.seeking_talent,
+        "seeking_description":venue.seeking_description,
+        "image_link": venue.image_link,
+        "past_shows":past_shows,
+        "upcoming_shows":upcoming_shows,
+        "num_past_shows": len(past_shows),
+        "num_upcoming_shows": len(upcoming_shows)
 
-  }
+    }
 
   
 
   
+    return data, ['Venue:{}'.format(venue.id)] + ['Artist:{}'.format(show['artist_id']) for show in past_shows + upcoming_shows]
+
+  data = cached_view('venue:{}'.format(venue_id), build)
   return render_template('pages/show_venue.html', venue=data)
 
 #  Create Venue
@@ -259,7 +701,13 @@ def create_venue_submission():
 
     venue = Venue(name=name,city=city,state=state,address=address,phone=phone,genres=genres,facebook_link=facebook_link,website=website,seeking_talent=seeking_talent,seeking_description=seeking_description)
     db.session.add(venue)
+    count_areas({(state, city): (1, 0)})
     db.session.commit()
+    if venue_index.loaded:
+      venue_index.add(venue.id, venue.name, venue.city, venue.state, venue.genres)
+    if venue_facets.loaded:
+      venue_facets.add(venue.id, venue.genres, venue.state, venue.seeking_talent)
+    cache.invalidate('Venue')
   
   except:
 
@@ -289,7 +737,11 @@ def delete_venue(venue_id):
   try:
     venue = Venue.query.get(venue_id)
     db.session.delete(venue)
+    count_areas({(venue.state, venue.city): (-1, -venue.upcoming_show_count)})
     db.session.commit()
+    venue_index.remove(int(venue_id))
+    venue_facets.remove(int(venue_id))
+    cache.invalidate('Venue', 'Venue:{}'.format(venue_id), 'Show')
   except:
     error = True
     db.session.rollback()
@@ -303,7 +755,7 @@ def delete_venue(venue_id):
     flash('Venue ' + request.form['name'] + ' was successfully listed!')
   # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
   # clicking that button delete it from the db then redirect the user to the homepage
-  return None
+  return jsonify({"success": not error})
 
 #  Artists
 #  ----------------------------------------------------------------
@@ -311,16 +763,19 @@ def delete_venue(venue_id):
 def artists():
   # TODO: replace with real data returned from querying the database
 
-  artists = db.session.query(Artist).all()
-  data = []
+  query = db.session.query(Artist.id, Artist.name)
 
-  for artist in artists:
-    data.append({
-      "id": artist.id,
-      "name": artist.name
-    }
-    )
-  return render_template('pages/artists.html', artists=data)
+  if request.args.get('stream'):
+    rows = query.order_by(Artist.name, Artist.id).yield_per(1000)
+    data = ({"id": row.id, "name": row.name} for row in rows)
+    return stream_template('pages/artists.html', artists=data, pager=None)
+
+  def build():
+    rows, pager = keyset_page(query, [Artist.name, Artist.id], [str, int], app.config['LISTING_PAGE_SIZE'])
+    return ([{"id": row.id, "name": row.name} for row in rows], pager), ['Artist']
+
+  data, pager = cached_view('artists?' + request.query_string.decode(), build)
+  return render_template('pages/artists.html', artists=data, pager=pager)
 
 @app.route('/artists/search', methods=['POST'])
 def search_artists():
@@ -329,78 +784,74 @@ def search_artists():
   # search for "band" should return "The Wild Sax Band".
   
   search_term = request.form.get('search_term','')
-
-  
-  search_term = search_term.casefold()
-  artists = db.session.query(Artist).all()
-  response = {}
-  data = []
-  upcoming_shows = []
-  count = 0
-  for artist in artists:
-    name = artist.name
-    name = name.casefold()
-
-    if(name.rfind(search_term) > -1):
-      count += 1
-      data.append({
-        "id": artist.id,
-        "name": artist.name,
-        "num_upcoming_shows": db.session.query(Show).filter(Show.artist_id==artist.id).filter(Show.start_time > datetime.now()).count()
-      })
-
-  response= {
-    "count": count,
-    "data": data
-  }
+  limit, offset = search_paging()
+  if app.config['SEARCH_BACKEND'] == 'memory':
+    ids = memory_index(artist_index, Artist).search(search_term)
+    response = search_by_ids(Artist, artist_index, ids, limit, offset)
+  else:
+    response = search_by_name(Artist, search_term, limit, offset)
 
   return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
 
+@app.route('/artists/discover')
+def discover_artists():
+  # e.g. /artists/discover?genre=Jazz,Blues&seeking_venue=true
+  return discover(Artist, artist_facets, 'seeking_venue')
+
 @app.route('/artists/<int:artist_id>')
 def show_artist(artist_id):
   # shows the venue page with the given venue_id
   # TODO: replace with real venue data from the venues table, using venue_id
 
-  artist = db.session.query(Artist).filter_by(id=artist_id).first()
+  def build():
+    now = datetime.now()
+    rows = db.session.query(Artist, Show.start_time, Venue.id, Venue.name, Venue.image_link) \
+      .outerjoin(Show, Show.artist_id == Artist.id) \
+      .outerjoin(Venue, Venue.id == Show.venue_id) \
+      .filter(Artist.id == artist_id) \
+      .order_by(Show.start_time) \
+      .all()
+    if not rows:
+      abort(404)
+
+    artist = rows[0].Artist
+    upcoming_shows = []
+    past_shows = []
+
+    for row in rows:
+      if row.start_time is None:
+        continue
+      show = {
+        "venue_id": row.id,
+        "venue_name": row.name,
+        "venue_image_link": row.image_link,
+        "start_time": row.start_time
+      }
+      if row.start_time > now:
+        upcoming_shows.append(show)
+      else:
+        past_shows.append(show)
+
+    data={
+      "id": artist.id,
+      "name": artist.name,
+      "genres": artist.genres,
+      "city": artist.city,
+      "state": artist.state,
+      "phone": artist.phone,
+      "website": artist.website,
+      "facebook_link": artist.facebook_link,
+      "seeking_venue": artist.seeking_venue,
+      "seeking_description": artist.seeking_description,
+      "image_link": artist.image_link,
+      "past_shows": past_shows,
+      "upcoming_shows": upcoming_shows,
+      "past_shows_count": len(past_shows),
+      "upcoming_shows_count": len(upcoming_shows),
+    }
+    return data, ['Artist:{}'.format(artist.id)] + ['Venue:{}'.format(show['venue_id']) for show in past_shows + upcoming_shows]
 
-  upcoming_shows_list = db.session.query(Show).filter(Show.artist_id==artist_id).filter(Show.start_time > datetime.now())
-  past_shows_list = db.session.query(Show).join(Venue).filter(Show.artist_id==artist_id).filter(Show.start_time <= datetime.now())
-
-  upcoming_shows = []
-  past_shows = []
-
-  for show in upcoming_shows_list:
-    upcoming_shows.append({
-      "venue_id": show.Venue.id,
-      "venue_name": show.Venue.name,
-      "venue_image_link": show.Venue.image_link,
-      "start_time": show.start_time.strftime('%Y-%m-%d %H:%M:%S')
-    })
-
-  for show in past_shows_list:
-    past_shows.append({
-      "venue_id": show.Venue.id,
-      "venue_name": show.Venue.name,
-      "venue_image_link": show.Venue.image_link,
-      "start_time": show.start_time.strftime('%Y-%m-%d %H:%M:%S')
-    })
-  data={
-    "id": artist.id,
-    "name": artist.name,
-    "genres": artist.genres,
-    "city": artist.city,
-    "state": artist.state,
-    "phone": artist.phone,
-    "website": artist.website,
-    "facebook_link": artist.facebook_link,
-    "seeking_venue": artist.seeking_venue,
-    "seeking_description": artist.seeking_description,
-    "image_link": artist.image_link,
-    "past_shows": past_shows,
-    "upcoming_shows": upcoming_shows,
-    "past_shows_count": len(past_shows),
-    "upcoming_shows_count": len(upcoming_shows),
-  }
+  data = cached_view('artist:{}'.format(artist_id), build)
   return render_template('pages/show_artist.html', artist=data)
 
 #  Update
@@ -445,6 +896,11 @@ def edit_artist_submission(artist_id):
     artist.seeking_description = request.form['seeking_description']
     artist.image_link= request.form['image_link']
     db.session.commit()
+    if artist_index.loaded:
+      artist_index.add(artist.id, artist.name, artist.city, artist.state, artist.genres)
+    if artist_facets.loaded:
+      artist_facets.add(artist.id, artist.genres, artist.state, artist.seeking_venue)
+    cache.invalidate('Artist', 'Artist:{}'.format(artist_id))
   except:
     error = True
     db.session.rollback()
@@ -490,18 +946,26 @@ def edit_venue_submission(venue_id):
 
     
   try:
+    area = (venue.state, venue.city)
     venue.name = request.form['name']
     venue.genres = request.form.getlist('genres')
     venue.city = request.form['city']
     venue.state = request.form['state']
+    if (venue.state, venue.city) != area:
+      count_areas({area: (-1, -venue.upcoming_show_count), (venue.state, venue.city): (1, venue.upcoming_show_count)})
     venue.phone= request.form['phone']
     venue.address = request.form['address']
     venue.website = request.form['website']
     venue.facebook_link=request.form['facebook_link']
-    venue.seeking_venue = True if 'seeking_venue' in request.form else False
+    venue.seeking_talent = True if 'seeking_talent' in request.form else False
     venue.seeking_description = request.form['seeking_description']
     venue.image_link= request.form['image_link']
     db.session.commit()
+    if venue_index.loaded:
+      venue_index.add(venue.id, venue.name, venue.city, venue.state, venue.genres)
+    if venue_facets.loaded:
+      venue_facets.add(venue.id, venue.genres, venue.state, venue.seeking_talent)
+    cache.invalidate('Venue', 'Venue:{}'.format(venue_id))
   except:
     error = True
     db.session.rollback()
@@ -548,6 +1012,11 @@ def create_artist_submission():
     artist = Artist(name=name,city=city,state=state,phone=phone,genres=genres,facebook_link=facebook_link,website=website,seeking_venue=seeking_venue,seeking_description=seeking_description)
     db.session.add(artist)
     db.session.commit()
+    if artist_index.loaded:
+      artist_index.add(artist.id, artist.name, artist.city, artist.state, artist.genres)
+    if artist_facets.loaded:
+      artist_facets.add(artist.id, artist.genres, artist.state, artist.seeking_venue)
+    cache.invalidate('Artist')
   
   except:
 
@@ -580,19 +1049,31 @@ def shows():
   # TODO: replace with real venues data.
   #       num_shows should be aggregated based on number of upcoming shows per venue.
 
-  shows = db.session.query(Show).join(Venue).join(Artist).all()
-  data = []
-  for show in shows:
-    data.append({
-    "venue_id": show.venue_id,
-    "venue_name": show.Venue.name,
-    "artist_id": show.Artist.id,
-    "artist_name": show.Artist.name,
-    "artist_image_link": show.Artist.image_link,
-    "start_time": show.start_time.strftime('%Y-%m-%d %H:%M:%S')      
-    })
- 
-  return render_template('pages/shows.html', shows=data)
+  query = db.session.query(Show.id, Show.start_time, Show.venue_id, Venue.name.label('venue_name'),
+                           Show.artist_id, Artist.name.label('artist_name'), Artist.image_link.label('artist_image_link')) \
+    .join(Venue, Venue.id == Show.venue_id) \
+    .join(Artist, Artist.id == Show.artist_id)
+
+  def format_show(row):
+    return {
+      "venue_id": row.venue_id,
+      "venue_name": row.venue_name,
+      "artist_id": row.artist_id,
+      "artist_name": row.artist_name,
+      "artist_image_link": row.artist_image_link,
+      "start_time": row.start_time
+    }
+
+  if request.args.get('stream'):
+    rows = query.order_by(Show.start_time, Show.id).yield_per(1000)
+    return stream_template('pages/shows.html', shows=(format_show(row) for row in rows), pager=None)
+
+  def build():
+    rows, pager = keyset_page(query, [Show.start_time, Show.id], [datetime.fromisoformat, int], app.config['LISTING_PAGE_SIZE'])
+    return ([format_show(row) for row in rows], pager), ['Show', 'Venue', 'Artist']
+
+  data, pager = cached_view('shows?' + request.query_string.decode(), build)
+  return render_template('pages/shows.html', shows=data, pager=pager)
 
 @app.route('/shows/create')
 def create_shows():
@@ -609,13 +1090,18 @@ def create_show_submission():
   try:
     venue_id = request.form['venue_id']
     artist_id = request.form['artist_id']
-    start_time = request.form['start_time']
+    start_time = parse_start_time(request.form['start_time'])
 
 
 
     show = Show(venue_id=venue_id,artist_id=artist_id,start_time=start_time)
     db.session.add(show)
+    # the precomputed counters are updated in the same transaction as the
+    # insert; `flask sweep-upcoming-shows` decrements them once it has started.
+    if start_time > datetime.now():
+      count_upcoming_show(venue_id, artist_id, 1)
     db.session.commit()
+    cache.invalidate('Show', 'Venue:{}'.format(venue_id), 'Artist:{}'.format(artist_id))
   
   except:
 
@@ -641,6 +1127,98 @@ def create_show_submission():
   # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
   return render_template('pages/home.html')
 
+@app.route('/shows/batch', methods=['POST'])
+def create_show_batch():
+  # schedules a list of {"artist_id", "venue_id", "start_time"} in one
+  # transaction. Items with unknown ids, unparsable times or a venue/artist
+  # already booked within SHOW_SLOT_MINUTES are reported and skipped.
+  items = request.get_json(silent=True)
+  if not isinstance(items, list) or len(items) > app.config['SHOW_BATCH_LIMIT']:
+    return jsonify({
+      "success": False,
+      "error": 400,
+      "message": "expected a JSON list of at most {} shows".format(app.config['SHOW_BATCH_LIMIT'])
+    }), 400
+
+  results = []
+  parsed = []
+  for index, item in enumerate(items):
+    try:
+      parsed.append((index, int(item['venue_id']), int(item['artist_id']), parse_start_time(item['start_time'])))
+      results.append(None)
+    except (KeyError, TypeError, ValueError, OverflowError):
+      results.append({"index": index, "success": False, "error": "venue_id, artist_id and start_time are required"})
+
+  slot = timedelta(minutes=app.config['SHOW_SLOT_MINUTES'])
+  calendar = BookingCalendar(slot)
+  venue_ids = {venue_id for _, venue_id, _, _ in parsed}
+  artist_ids = {artist_id for _, _, artist_id, _ in parsed}
+  if parsed:
+    venue_ids = {row.id for row in db.session.query(Venue.id).filter(Venue.id.in_(venue_ids))}
+    artist_ids = {row.id for row in db.session.query(Artist.id).filter(Artist.id.in_(artist_ids))}
+    times = [start_time for _, _, _, start_time in parsed]
+    booked = db.session.query(Show.venue_id, Show.artist_id, Show.start_time) \
+      .filter(or_(Show.venue_id.in_(venue_ids), Show.artist_id.in_(artist_ids))) \
+      .filter(Show.start_time > min(times) - slot, Show.start_time < max(times) + slot)
+    for row in booked:
+      calendar.add(('venue', row.venue_id), row.start_time)
+      calendar.add(('artist', row.artist_id), row.start_time)
+
+  rows = []
+  for index, venue_id, artist_id, start_time in parsed:
+    error = None
+    if venue_id not in venue_ids:
+      error = "venue {} does not exist".format(venue_id)
+    elif artist_id not in artist_ids:
+      error = "artist {} does not exist".format(artist_id)
+    elif calendar.conflict(('venue', venue_id), start_time):
+      error = "venue {} is already booked at {}".format(venue_id, calendar.conflict(('venue', venue_id), start_time))
+    elif calendar.conflict(('artist', artist_id), start_time):
+      error = "artist {} is already booked at {}".format(artist_id, calendar.conflict(('artist', artist_id), start_time))
+    if error:
+      results[index] = {"index": index, "success": False, "error": error}
+      continue
+
+    calendar.add(('venue', venue_id), start_time)
+    calendar.add(('artist', artist_id), start_time)
+    rows.append({"venue_id": venue_id, "artist_id": artist_id, "start_time": start_time})
+    results[index] = {"index": index, "success": True}
+
+  try:
+    if rows:
+      # ids in the order of rows, which a multi-row INSERT .. RETURNING does not promise
+      ids = db.session.execute(Show.__table__.insert().returning(Show.__table__.c.id, sort_by_parameter_order=True), rows) \
+        .scalars().all()
+      now = datetime.now()
+      upcoming = [row for row in rows if row["start_time"] > now]
+      add_upcoming_show_counts(Counter(row["venue_id"] for row in upcoming), Counter(row["artist_id"] for row in upcoming))
+      created = [result for result in results if result["success"]]
+      for result, show_id in zip(created, ids):
+        result["id"] = show_id
+    db.session.commit()
+  except:
+    db.session.rollback()
+    print(sys.exc_info())
+    return jsonify({
+      "success": False,
+      "error": 500,
+      "message": "the batch could not be scheduled"
+    }), 500
+  finally:
+    db.session.close()
+
+  if rows:
+    cache.invalidate('Show', *['Venue:{}'.format(row["venue_id"]) for row in rows] + ['Artist:{}'.format(row["artist_id"]) for row in rows])
+  return jsonify({
+    "success": True,
+    "created": len(rows),
+    "results": results
+  })
+
+@app.route('/debug/cache')
+def cache_stats():
+  return jsonify(cache.stats())
+
 @app.errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
@@ -0,0 +1,238 @@
+"""Async JSON read API for fyyur, served from its own ASGI entry point.
+
+    uvicorn asgi:api --workers 4
+
+Routes mirror the HTML read pages:
+
+    GET /api/venues?after=...      venues grouped by area, keyset paginated
+    GET /api/venues/<id>           venue with past and upcoming shows
+    GET /api/artists?after=...     artists page, keyset paginated
+    GET /api/artists/<id>          artist with past and upcoming shows
+    GET /api/shows?after=...       shows page, keyset paginated
+
+Queries go through SQLAlchemy's asyncio extension and asyncpg using the
+Venue, Artist and Show models from app.py, so Postgres is required like for
+the app itself (the genres ARRAY columns have no SQLite type). The engine
+takes the pool settings of db_pool.py. The independent queries of the
+detail endpoints run concurrently, each on its own connection. Listings
+return at most ?limit= rows (LISTING_PAGE_SIZE by default, 1000 at most)
+and a `next` cursor to pass as ?after=.
+"""
+import asyncio
+import base64
+import json
+import re
+from datetime import datetime
+from urllib.parse import parse_qsl
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from app import app, Venue, Artist, Show, encode_cursor
+from db_pool import engine_options
+
+ASYNC_DRIVERS = {
+    'postgresql': 'postgresql+asyncpg',
+    'postgres': 'postgresql+asyncpg',
+    'postgresql+psycopg2': 'postgresql+asyncpg',
+}
+
+
+def async_url(url):
+    scheme, rest = url.split('://', 1)
+    return '{}://{}'.format(ASYNC_DRIVERS.get(scheme, scheme), rest)
+
+
+engine = create_async_engine(async_url(app.config['SQLALCHEMY_DATABASE_URI']),
+                             **engine_options(app.config['SQLALCHEMY_DATABASE_URI'], asyncio=True))
+Session = async_sessionmaker(engine, expire_on_commit=False)
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        self.status = status
+        self.message = message
+
+
+async def fetch(statement):
+    async with Session() as session:
+        return (await session.execute(statement)).all()
+
+
+def page_size(query):
+    try:
+        size = int(query.get('limit', app.config['LISTING_PAGE_SIZE']))
+    except ValueError:
+        raise HTTPError(400, 'limit must be an integer')
+    return max(1, min(size, 1000))
+
+
+def cursor(query, parsers):
+    token = query.get('after')
+    if not token:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+        if len(values) != len(parsers):
+            raise ValueError(token)
+        return tuple(parse(value) for parse, value in zip(parsers, values))
+    except (ValueError, TypeError):
+        raise HTTPError(400, 'invalid cursor')
+
+
+async def venues(query):
+    # pages of venues in (state, city, id) order along ix_Venue_state_city;
+    # an area can continue on the next page
+    limit = page_size(query)
+    after = cursor(query, [str, str, int])
+    statement = select(Venue.id, Venue.name, Venue.city, Venue.state, Venue.upcoming_show_count) \
+        .order_by(Venue.state, Venue.city, Venue.id) \
+        .limit(limit + 1)
+    if after:
+        statement = statement.where(tuple_(Venue.state, Venue.city, Venue.id) > tuple_(*after))
+    rows = await fetch(statement)
+    more = len(rows) > limit
+    rows = rows[:limit]
+    areas = []
+    for row in rows:
+        if not areas or areas[-1]['state'] != row.state or areas[-1]['city'] != row.city:
+            areas.append({'city': row.city, 'state': row.state, 'venues': []})
+        areas[-1]['venues'].append({'id': row.id, 'name': row.name, 'num_upcoming_shows': row.upcoming_show_count})
+    return {
+        'success': True,
+        'areas': areas,
+        'next': encode_cursor([rows[-1].state, rows[-1].city, rows[-1].id]) if more else None,
+    }
+
+
+async def artists(query):
+    limit = page_size(query)
+    after = cursor(query, [str, int])
+    statement = select(Artist.id, Artist.name).order_by(Artist.name, Artist.id).limit(limit + 1)
+    if after:
+        statement = statement.where(tuple_(Artist.name, Artist.id) > tuple_(*after))
+    rows = await fetch(statement)
+    more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        'success': True,
+        'artists': [{'id': row.id, 'name': row.name} for row in rows],
+        'next': encode_cursor([rows[-1].name, rows[-1].id]) if more else None,
+    }
+
+
+async def shows(query):
+    limit = page_size(query)
+    after = cursor(query, [datetime.fromisoformat, int])
+    statement = select(Show.id, Show.start_time, Show.venue_id, Venue.name.label('venue_name'),
+                       Show.artist_id, Artist.name.label('artist_name'), Artist.image_link.label('artist_image_link')) \
+        .join(Venue, Venue.id == Show.venue_id) \
+        .join(Artist, Artist.id == Show.artist_id) \
+        .order_by(Show.start_time, Show.id) \
+        .limit(limit + 1)
+    if after:
+        statement = statement.where(tuple_(Show.start_time, Show.id) > tuple_(*after))
+    rows = await fetch(statement)
+    more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        'success': True,
+        'shows': [{
+            'venue_id': row.venue_id,
+            'venue_name': row.venue_name,
+            'artist_id': row.artist_id,
+            'artist_name': row.artist_name,
+            'artist_image_link': row.artist_image_link,
+            'start_time': row.start_time,
+        } for row in rows],
+        'next': encode_cursor([rows[-1].start_time, rows[-1].id]) if more else None,
+    }
+
+
+async def detail(model, show_column, other, other_column, entity_id, prefix):
+    now = datetime.now()
+    shows = select(Show.start_time, other.id, other.name, other.image_link) \
+        .join(other, other.id == other_column) \
+        .where(show_column == entity_id) \
+        .order_by(Show.start_time)
+    entities, past, upcoming = await asyncio.gather(
+        fetch(select(model).where(model.id == entity_id)),
+        fetch(shows.where(Show.start_time <= now)),
+        fetch(shows.where(Show.start_time > now)),
+    )
+    if not entities:
+        raise HTTPError(404, 'resource not found')
+
+    entity = entities[0][0]
+    data = {column.key: getattr(entity, column.key) for column in model.__table__.columns}
+
+    def show(row):
+        return {
+            prefix + '_id': row.id,
+            prefix + '_name': row.name,
+            prefix + '_image_link': row.image_link,
+            'start_time': row.start_time,
+        }
+
+    data['past_shows'] = [show(row) for row in past]
+    data['upcoming_shows'] = [show(row) for row in upcoming]
+    data['past_shows_count'] = len(past)
+    data['upcoming_shows_count'] = len(upcoming)
+    return {'success': True, model.__name__.lower(): data}
+
+
+async def venue(query, venue_id):
+    return await detail(Venue, Show.venue_id, Artist, Show.artist_id, venue_id, 'artist')
+
+
+async def artist(query, artist_id):
+    return await detail(Artist, Show.artist_id, Venue, Show.venue_id, artist_id, 'venue')
+
+
+ROUTES = [
+    (re.compile(r'^/api/venues/?$'), venues),
+    (re.compile(r'^/api/venues/(\d+)$'), venue),
+    (re.compile(r'^/api/artists/?$'), artists),
+    (re.compile(r'^/api/artists/(\d+)$'), artist),
+    (re.compile(r'^/api/shows/?$'), shows),
+]
+
+
+def encode(body):
+    return json.dumps(body, default=lambda value: value.isoformat()).encode('utf-8')
+
+
+async def respond(send, status, body):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json')],
+    })
+    await send({'type': 'http.response.body', 'body': encode(body)})
+
+
+async def api(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await engine.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    if scope['type'] != 'http':
+        return
+
+    if scope['method'] != 'GET':
+        return await respond(send, 405, {'success': False, 'error': 405, 'message': 'method not allowed'})
+    query = dict(parse_qsl(scope.get('query_string', b'').decode('latin-1')))
+    for pattern, handler in ROUTES:
+        match = pattern.match(scope['path'])
+        if match:
+            try:
+                body = await handler(query, *(int(group) for group in match.groups()))
+            except HTTPError as error:
+                return await respond(send, error.status, {'success': False, 'error': error.status, 'message': error.message})
+            return await respond(send, 200, body)
+    await respond(send, 404, {'success': False, 'error': 404, 'message': 'resource not found'})
@@ -0,0 +1,79 @@
+"""Requests per second per core: sync HTML pages against the async JSON API.
+
+Start one single-worker server of each kind against the same database, then
+point the benchmark at both. Each route pair is driven by CLIENTS threads
+for DURATION seconds and the completed requests per second are printed
+side by side.
+
+    gunicorn -w 1 --threads 16 -b :8000 app:app &
+    uvicorn asgi:api --workers 1 --port 8001 --no-access-log &
+    python bench_async_api.py http://localhost:8000 http://localhost:8001 --clients 64
+"""
+import argparse
+import threading
+import time
+from urllib.error import URLError
+from urllib.request import urlopen
+
+ROUTES = [
+    ('/venues', '/api/venues'),
+    ('/venues/1', '/api/venues/1'),
+    ('/artists/1', '/api/artists/1'),
+    ('/artists', '/api/artists'),
+    ('/shows', '/api/shows'),
+]
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))] if samples else 0.0
+
+
+def drive(url, clients, duration, timeout):
+    lock = threading.Lock()
+    samples, errors = [], [0]
+    deadline = time.perf_counter() + duration
+
+    def client():
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                with urlopen(url, timeout=timeout) as response:
+                    response.read()
+            except (URLError, OSError):
+                with lock:
+                    errors[0] += 1
+                continue
+            with lock:
+                samples.append((time.perf_counter() - started) * 1000)
+
+    threads = [threading.Thread(target=client, daemon=True) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(samples) / duration, percentile(samples, 99), errors[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('sync_url')
+    parser.add_argument('async_url')
+    parser.add_argument('--clients', type=int, default=64)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--timeout', type=float, default=30)
+    args = parser.parse_args()
+
+    print('{:<12} {:>10} {:>10} {:>10} {:>10} {:>7}'.format(
+        'route', 'sync r/s', 'async r/s', 'sync p99', 'async p99', 'errors'))
+    for sync_route, async_route in ROUTES:
+        sync_rps, sync_p99, sync_errors = drive(
+            args.sync_url.rstrip('/') + sync_route, args.clients, args.duration, args.timeout)
+        async_rps, async_p99, async_errors = drive(
+            args.async_url.rstrip('/') + async_route, args.clients, args.duration, args.timeout)
+        print('{:<12} {:>10.0f} {:>10.0f} {:>10.1f} {:>10.1f} {:>7}'.format(
+            sync_route, sync_rps, async_rps, sync_p99, async_p99, sync_errors + async_errors))
+
+
+if __name__ == '__main__':
+    main()
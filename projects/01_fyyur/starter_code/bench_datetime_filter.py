@@ -0,0 +1,75 @@
+"""Micro-benchmark for the `datetime` Jinja filter.
+
+Renders pages/shows.html for 10k shows twice: the way it used to work
+(start times as strings, re-parsed by dateutil and formatted by
+babel.dates.format_datetime on every call) and with native datetimes and
+formatting.format_datetime. No database is needed.
+
+    python bench_datetime_filter.py --shows 10000
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+
+from app import app
+from formatting import format_datetime
+
+
+def legacy_format_datetime(value, format='medium'):
+    date = dateutil.parser.parse(value)
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format)
+
+
+def make_shows(count, rng):
+    start = datetime(2026, 1, 1, 20, 0)
+    return [{
+        'venue_id': rng.randrange(100),
+        'venue_name': 'Venue',
+        'artist_id': rng.randrange(1000),
+        'artist_name': 'Artist',
+        'artist_image_link': '',
+        # shows start on the hour, so many rows share a start time
+        'start_time': start + timedelta(hours=rng.randrange(24 * 90)),
+    } for _ in range(count)]
+
+
+def render(shows, repeat):
+    best = None
+    for _ in range(repeat):
+        with app.test_request_context('/shows'):
+            started = time.perf_counter()
+            app.jinja_env.get_template('pages/shows.html').render(shows=shows, pager=None)
+            elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--shows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    shows = make_shows(args.shows, random.Random(0))
+
+    legacy_shows = [dict(show, start_time=show['start_time'].strftime('%Y-%m-%d %H:%M:%S')) for show in shows]
+    app.jinja_env.filters['datetime'] = legacy_format_datetime
+    before = render(legacy_shows, args.repeat)
+
+    app.jinja_env.filters['datetime'] = format_datetime
+    after = render(shows, args.repeat)
+
+    print('pages/shows.html with {} shows'.format(args.shows))
+    print('  before: {:8.1f} ms'.format(before * 1000))
+    print('  after:  {:8.1f} ms  ({:.1f}x)'.format(after * 1000, before / after))
+
+
+if __name__ == '__main__':
+    main()
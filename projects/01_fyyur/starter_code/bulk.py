@@ -0,0 +1,245 @@
+"""Bulk import and export of venues, artists and shows.
+
+    flask fyyur import venues venues.csv
+    flask fyyur import artists artists.ndjson
+    flask fyyur import shows shows.csv
+    flask fyyur export shows shows.ndjson
+
+Rows are validated with the same forms as the web handlers and inserted in
+chunks, one transaction per chunk. The `id` column of imported venues and
+artists is the partner's id: it is mapped to the new database id in the
+ImportedId table so that the shows import can resolve `venue_id` and
+`artist_id`. The same transaction records the number of rows done in the
+ImportCheckpoint table, so the checkpoint and the id map can never disagree
+with the rows committed, and an interrupted import picks up from there when
+run again.
+"""
+import csv
+import json
+import os
+import time
+from collections import Counter
+from datetime import datetime
+from itertools import islice
+
+import click
+from flask.cli import AppGroup
+from werkzeug.datastructures import MultiDict
+
+from forms import VenueForm, ArtistForm, ShowForm
+
+fyyur_cli = AppGroup('fyyur', help='Bulk import and export of fyyur data.')
+
+ENTITIES = ('venues', 'artists', 'shows')
+FORMS = {'venues': VenueForm, 'artists': ArtistForm, 'shows': ShowForm}
+BOOLEAN_FIELDS = ('seeking_talent', 'seeking_venue')
+GENRE_SEPARATOR = ';'
+
+
+def models():
+    from app import db, Venue, Artist, Show
+    return db, {'venues': Venue, 'artists': Artist, 'shows': Show}
+
+
+def file_format(path, fmt):
+    if fmt:
+        return fmt
+    return 'ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv'
+
+
+def read_rows(path, fmt):
+    with open(path, newline='', encoding='utf-8') as f:
+        if fmt == 'csv':
+            for row in csv.DictReader(f):
+                if row.get('genres') is not None:
+                    row['genres'] = [g for g in row['genres'].split(GENRE_SEPARATOR) if g]
+                yield row
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def validate(entity, row):
+    """Return (values, None) for a valid row or (None, errors)."""
+    pairs = []
+    for key, value in row.items():
+        if isinstance(value, list):
+            pairs.extend((key, item) for item in value)
+        elif value is not None:
+            pairs.append((key, str(value)))
+
+    form = FORMS[entity](formdata=MultiDict(pairs), meta={'csrf': False})
+    if not form.validate():
+        return None, form.errors
+
+    values = {name: field.data for name, field in form._fields.items()}
+    for name in BOOLEAN_FIELDS:
+        if name in values:
+            values[name] = str(row.get(name, '')).lower() in ('1', 'true', 'y', 'yes')
+    return values, None
+
+
+def imported_ids(db, entity, source_ids):
+    """Map the partner ids among source_ids to the database ids imported for them."""
+    from app import ImportedId
+    keys = {str(value) for value in source_ids}
+    return dict(db.session.query(ImportedId.source_id, ImportedId.id)
+                .filter(ImportedId.entity == entity, ImportedId.source_id.in_(keys)))
+
+
+def resolve(id_map, existing, value):
+    key = str(value)
+    if key in id_map:
+        return id_map[key]
+    if key.isdigit() and int(key) in existing:
+        return int(key)
+    return None
+
+
+def insert_chunk(db, model, entity, chunk):
+    """Insert a chunk of validated rows and return the number of rows kept."""
+    table = model.__table__
+    if entity == 'shows':
+        from app import Venue, Artist, add_upcoming_show_counts
+        id_maps = {
+            'venues': imported_ids(db, 'venues', [r['venue_id'] for r in chunk]),
+            'artists': imported_ids(db, 'artists', [r['artist_id'] for r in chunk]),
+        }
+        venue_ids = {int(r['venue_id']) for r in chunk if str(r['venue_id']).isdigit()}
+        artist_ids = {int(r['artist_id']) for r in chunk if str(r['artist_id']).isdigit()}
+        existing_venues = {i for (i,) in db.session.query(Venue.id).filter(Venue.id.in_(venue_ids))}
+        existing_artists = {i for (i,) in db.session.query(Artist.id).filter(Artist.id.in_(artist_ids))}
+
+        rows = []
+        for row in chunk:
+            venue_id = resolve(id_maps['venues'], existing_venues, row['venue_id'])
+            artist_id = resolve(id_maps['artists'], existing_artists, row['artist_id'])
+            if venue_id is None or artist_id is None:
+                click.echo('skipping show with unknown venue {} or artist {}'.format(row['venue_id'], row['artist_id']), err=True)
+                continue
+            rows.append({'venue_id': venue_id, 'artist_id': artist_id, 'start_time': row['start_time']})
+        if rows:
+            db.session.execute(table.insert().values(rows))
+            now = datetime.now()
+            upcoming = [row for row in rows if row['start_time'] > now]
+            add_upcoming_show_counts(Counter(row['venue_id'] for row in upcoming), Counter(row['artist_id'] for row in upcoming))
+        return len(rows)
+
+    columns = set(table.columns.keys()) - {'id'}
+    rows = [{k: v for k, v in row.items() if k in columns} for row in chunk]
+    # sort_by_parameter_order returns the ids in the order of rows, which a
+    # multi-row INSERT .. RETURNING does not promise
+    new_ids = db.session.execute(table.insert().returning(table.c.id, sort_by_parameter_order=True), rows) \
+        .scalars().all()
+    if entity == 'venues':
+        from app import count_areas
+        areas = Counter((row.get('state'), row.get('city')) for row in rows)
+        count_areas({area: (count, 0) for area, count in areas.items()})
+
+    from app import ImportedId
+    id_map = {str(row['source_id']): new_id for row, new_id in zip(chunk, new_ids)
+              if row.get('source_id') not in (None, '')}
+    if id_map:
+        # a partner id imported again maps to the newest row
+        db.session.query(ImportedId) \
+            .filter(ImportedId.entity == entity, ImportedId.source_id.in_(list(id_map))) \
+            .delete(synchronize_session=False)
+        db.session.execute(ImportedId.__table__.insert(), [
+            {'entity': entity, 'source_id': source_id, 'id': new_id} for source_id, new_id in id_map.items()])
+    return len(rows)
+
+
+@fyyur_cli.command('import')
+@click.argument('entity', type=click.Choice(ENTITIES))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), help='Defaults to the file extension.')
+@click.option('--chunk-size', default=1000, show_default=True)
+@click.option('--checkpoint', help='Checkpoint name, defaults to the absolute path of PATH.')
+def import_rows(entity, path, fmt, chunk_size, checkpoint):
+    """Import ENTITY rows from a CSV or NDJSON file."""
+    from app import ImportCheckpoint
+    db, model_map = models()
+    fmt = file_format(path, fmt)
+    checkpoint = checkpoint or os.path.abspath(path)
+    saved = db.session.get(ImportCheckpoint, checkpoint)
+    done = saved.rows if saved else 0
+    if done:
+        click.echo('resuming {} after row {}'.format(path, done))
+
+    rows = islice(read_rows(path, fmt), done, None)
+    started = time.perf_counter()
+    imported = rejected = 0
+    line = done
+    while True:
+        chunk = []
+        for row in islice(rows, chunk_size):
+            line += 1
+            values, errors = validate(entity, row)
+            if errors:
+                rejected += 1
+                click.echo('row {}: {}'.format(line, errors), err=True)
+                continue
+            values['source_id'] = row.get('id')
+            chunk.append(values)
+        if line == done:
+            break
+
+        if chunk:
+            imported += insert_chunk(db, model_map[entity], entity, chunk)
+        db.session.merge(ImportCheckpoint(name=checkpoint, rows=line))
+        db.session.commit()
+        done = line
+
+        elapsed = time.perf_counter() - started
+        click.echo('{} rows imported, {} rejected, {:.0f} rows/s'.format(imported, rejected, imported / elapsed if elapsed else 0))
+
+    db.session.query(ImportCheckpoint).filter(ImportCheckpoint.name == checkpoint).delete()
+    db.session.commit()
+    from app import cache
+    cache.invalidate(model_map[entity].__name__, 'Show')
+    click.echo('done: {} rows imported, {} rejected'.format(imported, rejected))
+
+
+def export_value(value):
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return value
+
+
+@fyyur_cli.command('export')
+@click.argument('entity', type=click.Choice(ENTITIES))
+@click.argument('path', type=click.Path(dir_okay=False, writable=True))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), help='Defaults to the file extension.')
+@click.option('--chunk-size', default=1000, show_default=True)
+def export_rows(entity, path, fmt, chunk_size):
+    """Export every ENTITY row to a CSV or NDJSON file."""
+    db, model_map = models()
+    table = model_map[entity].__table__
+    columns = [c for c in table.columns.keys() if c != 'upcoming_show_count']
+    fmt = file_format(path, fmt)
+
+    # stream_results asks the driver for a server-side cursor
+    result = db.session.connection(execution_options={'stream_results': True}) \
+        .execute(table.select().with_only_columns(*[table.c[c] for c in columns]).order_by(table.c.id))
+
+    started = time.perf_counter()
+    exported = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = None
+        if fmt == 'csv':
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+        for rows in iter(lambda: result.fetchmany(chunk_size), []):
+            for row in rows:
+                record = {c: export_value(row[i]) for i, c in enumerate(columns)}
+                if writer:
+                    if isinstance(record.get('genres'), list):
+                        record['genres'] = GENRE_SEPARATOR.join(record['genres'])
+                    writer.writerow(record)
+                else:
+                    f.write(json.dumps(record) + '\n')
+            exported += len(rows)
+            elapsed = time.perf_counter() - started
+            click.echo('{} rows exported, {:.0f} rows/s'.format(exported, exported / elapsed if elapsed else 0))
+    db.session.commit()
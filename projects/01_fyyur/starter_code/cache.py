@@ -0,0 +1,210 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy.exc import IntegrityError
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+class MemoryCache:
+    """In-process LRU cache with a per-entry TTL and tag based invalidation.
+
+    Every entry is stored with the set of tags it depends on (for example
+    'Venue:3'); invalidate() drops every entry carrying one of the tags.
+
+    Other processes (the other workers, the `flask` commands) cannot reach
+    these entries, so with a `generation` (see DatabaseGeneration) every
+    invalidate() also bumps a counter they share, and an entry stored at an
+    older generation is a miss. An entry is stored at the generation read by
+    the get() that missed it, before its data was built, so data built while
+    another process was writing is dropped as well.
+    """
+
+    def __init__(self, max_entries=1024, ttl=60, generation=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.generation = generation
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._tags = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        generation = self._local.generation = self.generation.current() if self.generation else None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.monotonic() or entry[3] != generation:
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, tags=()):
+        generation = getattr(self._local, 'generation', None)
+        if generation is None and self.generation:
+            generation = self.generation.current()
+        self._local.generation = None
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            tags = frozenset(tags)
+            self._entries[key] = (value, time.monotonic() + self.ttl, tags, generation)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, *tags):
+        with self._lock:
+            for tag in tags:
+                for key in self._tags.pop(tag, ()):
+                    self._drop(key)
+        if self.generation and tags:
+            self.generation.bump()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+        if self.generation:
+            self.generation.bump()
+
+    def stats(self):
+        return {
+            'backend': 'memory',
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self._entries),
+        }
+
+    def _drop(self, key):
+        _, _, tags, _ = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+class DatabaseGeneration:
+    """Invalidation counter in a one-row table, shared by every process on the database.
+
+    model has an integer primary key `id` and an integer `generation`; the
+    row is created by the first bump().
+    """
+
+    def __init__(self, db, model):
+        self.db = db
+        self.model = model
+
+    def current(self):
+        return self.db.session.query(self.model.generation).filter(self.model.id == 1).scalar() or 0
+
+    def bump(self):
+        # called after the write committed, in a transaction of its own
+        session = self.db.session
+        row = session.query(self.model).filter(self.model.id == 1)
+        values = {self.model.generation: self.model.generation + 1}
+        if not row.update(values, synchronize_session=False):
+            try:
+                with session.begin_nested():
+                    session.add(self.model(id=1, generation=1))
+            except IntegrityError:
+                # another process created the row first
+                row.update(values, synchronize_session=False)
+        session.commit()
+
+
+class RedisCache:
+    """Cache backend for a local Redis (or Redis-protocol compatible) server.
+
+    Values are pickled with a TTL; each tag is a Redis set holding the keys
+    that depend on it. Eviction is left to the server's maxmemory policy, so
+    the eviction counter reports the server's evicted_keys.
+    """
+
+    def __init__(self, url='redis://localhost:6379/0', ttl=60, prefix='fyyur:'):
+        if redis is None:
+            raise RuntimeError('CACHE_BACKEND = "redis" requires the redis package')
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return pickle.loads(raw)
+
+    def set(self, key, value, tags=()):
+        pipe = self.client.pipeline()
+        pipe.set(self.prefix + key, pickle.dumps(value), ex=self.ttl)
+        for tag in tags:
+            pipe.sadd(self.prefix + 'tag:' + tag, self.prefix + key)
+            pipe.expire(self.prefix + 'tag:' + tag, self.ttl)
+        pipe.execute()
+
+    def invalidate(self, *tags):
+        for tag in tags:
+            tag_key = self.prefix + 'tag:' + tag
+            keys = self.client.smembers(tag_key)
+            self.client.delete(tag_key, *keys)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+    def stats(self):
+        return {
+            'backend': 'redis',
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.client.info('stats').get('evicted_keys', 0),
+        }
+
+
+class NullCache:
+    """Backend used when caching is switched off."""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, tags=()):
+        pass
+
+    def invalidate(self, *tags):
+        pass
+
+    def clear(self):
+        pass
+
+    def stats(self):
+        return {'backend': 'none'}
+
+
+def create_cache(config, generation=None):
+    backend = config.get('CACHE_BACKEND', 'memory')
+    if backend == 'memory':
+        return MemoryCache(config.get('CACHE_MAX_ENTRIES', 1024), config.get('CACHE_TTL', 60), generation)
+    if backend == 'redis':
+        return RedisCache(config.get('CACHE_REDIS_URL', 'redis://localhost:6379/0'), config.get('CACHE_TTL', 60))
+    return NullCache()
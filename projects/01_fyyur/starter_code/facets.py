@@ -0,0 +1,241 @@
+import threading
+import time
+
+# ids are split into containers of 2 ** 16, as in roaring bitmaps: only the
+# containers holding at least one id are stored, each as an int bitset.
+CONTAINER_BITS = 16
+CONTAINER_MASK = (1 << CONTAINER_BITS) - 1
+CONTAINER_BYTES = (1 << CONTAINER_BITS) // 8
+
+try:
+    popcount = int.bit_count
+except AttributeError:  # Python < 3.10
+    def popcount(bits):
+        return bin(bits).count('1')
+
+
+class Bitmap:
+    """Set of non-negative ints stored as {container: bitset}."""
+
+    __slots__ = ('containers',)
+
+    def __init__(self, containers=None):
+        self.containers = containers if containers is not None else {}
+
+    @classmethod
+    def from_ids(cls, ids):
+        # setting bits in a bytearray and converting each container once
+        # avoids building a new int per id
+        buffers = {}
+        for value in ids:
+            key = value >> CONTAINER_BITS
+            buffer = buffers.get(key)
+            if buffer is None:
+                buffer = buffers[key] = bytearray(CONTAINER_BYTES)
+            low = value & CONTAINER_MASK
+            buffer[low >> 3] |= 1 << (low & 7)
+        return cls({key: int.from_bytes(buffer, 'little') for key, buffer in buffers.items()})
+
+    def __len__(self):
+        return sum(popcount(bits) for bits in self.containers.values())
+
+    def __bool__(self):
+        return bool(self.containers)
+
+    def add(self, value):
+        key = value >> CONTAINER_BITS
+        self.containers[key] = self.containers.get(key, 0) | 1 << (value & CONTAINER_MASK)
+
+    def discard(self, value):
+        key = value >> CONTAINER_BITS
+        bits = self.containers.get(key, 0) & ~(1 << (value & CONTAINER_MASK))
+        if bits:
+            self.containers[key] = bits
+        else:
+            self.containers.pop(key, None)
+
+    def __and__(self, other):
+        small, large = sorted((self.containers, other.containers), key=len)
+        result = {}
+        for key, bits in small.items():
+            bits &= large.get(key, 0)
+            if bits:
+                result[key] = bits
+        return Bitmap(result)
+
+    def __or__(self, other):
+        result = dict(self.containers)
+        for key, bits in other.containers.items():
+            result[key] = result.get(key, 0) | bits
+        return Bitmap(result)
+
+    def page(self, offset, limit):
+        """The ids from position offset to offset + limit, in ascending order."""
+        ids = []
+        for key in sorted(self.containers):
+            bits = self.containers[key]
+            count = popcount(bits)
+            if offset >= count:
+                offset -= count
+                continue
+            base = key << CONTAINER_BITS
+            while bits and len(ids) < limit:
+                lowest = bits & -bits
+                if offset:
+                    offset -= 1
+                else:
+                    ids.append(base + lowest.bit_length() - 1)
+                bits ^= lowest
+            if len(ids) >= limit:
+                break
+        return ids
+
+
+class FacetIndex:
+    """In-process bitmap index over the filterable fields of one entity type.
+
+    Every (field, value) pair, e.g. ('genres', 'Jazz'), ('state', 'CA') or
+    ('seeking_talent', True), is mapped to a Bitmap of the ids having it; a
+    list valued field (genres) sets one bitmap per item. query() ANDs its
+    clauses and ORs the values within a clause. Like SearchIndex, it is kept
+    current with add() and remove() from the write handlers, and each worker
+    process keeps its own copy.
+
+    Writes made by other processes (other workers, `flask fyyur import`,
+    `flask fyyur generate`) are only seen once refresh() loads the rows
+    again, at most `reload_interval` seconds after the previous load; until
+    then rows they deleted can still match and rows they added cannot.
+    """
+
+    def __init__(self, fields, reload_interval=300):
+        self.fields = tuple(fields)
+        self.reload_interval = reload_interval
+        self.loaded = False
+        self.loaded_at = None
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        # (doc_id, values or None) of the add() and remove() calls made while
+        # load() reads its rows, replayed over the rows once they are read
+        self._changes = None
+        self._bitmaps = {}
+        self._all = Bitmap()
+        self._documents = {}
+
+    @property
+    def stale(self):
+        return not self.loaded or time.monotonic() >= self.loaded_at + self.reload_interval
+
+    def refresh(self, rows):
+        """Load rows() if the index was never loaded or is stale.
+
+        Only one thread loads; while it does, the others keep querying the
+        previous rows instead of waiting, unless there are none yet.
+        """
+        if not self.stale or not self._load_lock.acquire(blocking=not self.loaded):
+            return
+        try:
+            if self.stale:
+                self.load(rows())
+        finally:
+            self._load_lock.release()
+
+    def load(self, rows):
+        """Fill the index from (id, *fields) rows."""
+        with self._lock:
+            self._changes = []
+        try:
+            postings = {}
+            documents = {}
+            for row in rows:
+                doc_id, values = row[0], tuple(row[1:])
+                documents[doc_id] = values
+                for key in self._keys(values):
+                    ids = postings.get(key)
+                    if ids is None:
+                        postings[key] = [doc_id]
+                    else:
+                        ids.append(doc_id)
+            bitmaps = {key: Bitmap.from_ids(ids) for key, ids in postings.items()}
+            everything = Bitmap.from_ids(documents)
+        except BaseException:
+            with self._lock:
+                self._changes = None
+            raise
+        with self._lock:
+            self._bitmaps = bitmaps
+            self._all = everything
+            self._documents = documents
+            for doc_id, values in self._changes:
+                self._remove(doc_id)
+                if values is not None:
+                    self._add(doc_id, values)
+            self._changes = None
+            self.loaded = True
+            self.loaded_at = time.monotonic()
+
+    def add(self, doc_id, *values):
+        """Index a row, replacing whatever was indexed for doc_id before."""
+        with self._lock:
+            self._remove(doc_id)
+            self._add(doc_id, values)
+            if self._changes is not None:
+                self._changes.append((doc_id, values))
+
+    def remove(self, doc_id):
+        with self._lock:
+            self._remove(doc_id)
+            if self._changes is not None:
+                self._changes.append((doc_id, None))
+
+    def query(self, clauses, offset=0, limit=None):
+        """Return (count, ids) of the rows matching every (field, values) clause.
+
+        A row matches a clause when it has any of the values, so
+        [('genres', ['Jazz', 'Blues']), ('state', ['CA'])] is jazz or blues
+        in CA. ids is the page from offset, ordered by id; no clauses match
+        every row.
+        """
+        with self._lock:
+            matches = []
+            for field, values in clauses:
+                bitmaps = [self._bitmaps[(field, value)] for value in values if (field, value) in self._bitmaps]
+                bitmap = bitmaps[0] if bitmaps else Bitmap()
+                for other in bitmaps[1:]:
+                    bitmap = bitmap | other
+                matches.append(bitmap)
+            # intersect the smallest containers first so the rest stays small
+            result = self._all
+            for bitmap in sorted(matches, key=lambda bitmap: len(bitmap.containers)):
+                if not result:
+                    break
+                result = result & bitmap
+            return len(result), result.page(offset, len(self._documents) if limit is None else limit)
+
+    def _keys(self, values):
+        keys = []
+        for field, value in zip(self.fields, values):
+            if isinstance(value, list):
+                keys.extend((field, item) for item in set(value))
+            elif value is not None:
+                keys.append((field, value))
+        return keys
+
+    def _add(self, doc_id, values):
+        for key in self._keys(values):
+            bitmap = self._bitmaps.get(key)
+            if bitmap is None:
+                bitmap = self._bitmaps[key] = Bitmap()
+            bitmap.add(doc_id)
+        self._all.add(doc_id)
+        self._documents[doc_id] = values
+
+    def _remove(self, doc_id):
+        values = self._documents.pop(doc_id, None)
+        if values is None:
+            return
+        for key in self._keys(values):
+            bitmap = self._bitmaps[key]
+            bitmap.discard(doc_id)
+            if not bitmap:
+                del self._bitmaps[key]
+        self._all.discard(doc_id)
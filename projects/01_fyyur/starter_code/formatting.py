@@ -0,0 +1,41 @@
+"""Date formatting behind the `datetime` Jinja filter.
+
+Show listings format the same few start times over and over, so compiled
+Babel patterns are kept per (format, locale) and formatted strings are
+memoized. Handlers pass datetime objects straight through; strings are still
+accepted and parsed.
+"""
+from datetime import datetime, timezone
+from functools import lru_cache
+
+import babel.dates
+import dateutil.parser
+from babel import Locale
+from babel.dates import LC_TIME, parse_pattern
+
+FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+
+@lru_cache(maxsize=64)
+def compiled_pattern(format, locale):
+    return parse_pattern(FORMATS.get(format, format)), Locale.parse(locale)
+
+
+@lru_cache(maxsize=8192)
+def _format(value, format, locale):
+    if format in ('long', 'short'):
+        return babel.dates.format_datetime(value, format, locale=locale)
+    pattern, locale = compiled_pattern(format, locale)
+    if value.tzinfo is None:
+        # babel.dates.format_datetime treats naive datetimes as UTC as well
+        value = value.replace(tzinfo=timezone.utc)
+    return pattern.apply(value, locale)
+
+
+def format_datetime(value, format='medium', locale=None):
+    if not isinstance(value, datetime):
+        value = dateutil.parser.parse(value)
+    return _format(value, format, locale or LC_TIME or 'en_US_POSIX')
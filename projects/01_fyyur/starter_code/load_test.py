@@ -0,0 +1,82 @@
+"""Concurrent load test against a running fyyur server.
+
+Starts CLIENTS threads that request the read routes in a loop for DURATION
+seconds and prints p50/p99 latency and errors for every INTERVAL, so a
+pool that runs out of connections shows up as latency climbing over time.
+The pool metrics from /debug/metrics are printed at the end.
+
+    DB_POOL_SIZE=10 DB_MAX_OVERFLOW=5 gunicorn -w 8 --threads 8 app:app &
+    python load_test.py http://localhost:8000 --clients 500 --duration 60
+"""
+import argparse
+import threading
+import time
+from urllib.error import URLError
+from urllib.request import urlopen
+
+ROUTES = ['/venues', '/artists', '/shows', '/venues/1', '/artists/1']
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))] if samples else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('base_url')
+    parser.add_argument('--clients', type=int, default=500)
+    parser.add_argument('--duration', type=float, default=60)
+    parser.add_argument('--interval', type=float, default=5)
+    parser.add_argument('--timeout', type=float, default=30)
+    args = parser.parse_args()
+
+    lock = threading.Lock()
+    window = {'samples': [], 'errors': 0}
+    stop = threading.Event()
+
+    def client(n):
+        i = n
+        while not stop.is_set():
+            url = args.base_url.rstrip('/') + ROUTES[i % len(ROUTES)]
+            i += 1
+            started = time.perf_counter()
+            try:
+                with urlopen(url, timeout=args.timeout) as response:
+                    response.read()
+                failed = False
+            except (URLError, OSError):
+                failed = True
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                if failed:
+                    window['errors'] += 1
+                else:
+                    window['samples'].append(elapsed)
+
+    threads = [threading.Thread(target=client, args=(n,), daemon=True) for n in range(args.clients)]
+    for thread in threads:
+        thread.start()
+
+    print('{:>6} {:>8} {:>10} {:>10} {:>7}'.format('t (s)', 'req/s', 'p50 (ms)', 'p99 (ms)', 'errors'))
+    started = time.perf_counter()
+    while time.perf_counter() - started < args.duration:
+        time.sleep(args.interval)
+        with lock:
+            samples, errors = window['samples'], window['errors']
+            window['samples'], window['errors'] = [], 0
+        print('{:>6.0f} {:>8.0f} {:>10.1f} {:>10.1f} {:>7}'.format(
+            time.perf_counter() - started, len(samples) / args.interval,
+            percentile(samples, 50), percentile(samples, 99), errors))
+    stop.set()
+    for thread in threads:
+        thread.join(args.timeout)
+
+    with urlopen(args.base_url.rstrip('/') + '/debug/metrics') as response:
+        for line in response.read().decode('utf-8').splitlines():
+            if line.startswith('db_pool_'):
+                print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+"""indexes for show lookups and genre filters
+
+Revision ID: 566716b34891
+Revises: b602fd397412
+Create Date: 2026-10-18 11:02:47.531890
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '566716b34891'
+down_revision = 'b602fd397412'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Artist.genres was created as a plain string; the model declares it as
+    # an array like Venue.genres, which the GIN index below requires.
+    op.alter_column('Artist', 'genres',
+                    existing_type=sa.String(length=120),
+                    type_=sa.ARRAY(sa.String()),
+                    postgresql_using='genres::varchar[]')
+    op.create_index('ix_Show_venue_id_start_time', 'Show', ['venue_id', 'start_time'], unique=False)
+    op.create_index('ix_Show_artist_id_start_time', 'Show', ['artist_id', 'start_time'], unique=False)
+    op.create_index('ix_Venue_genres', 'Venue', ['genres'], unique=False, postgresql_using='gin')
+    op.create_index('ix_Artist_genres', 'Artist', ['genres'], unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    op.drop_index('ix_Artist_genres', table_name='Artist')
+    op.drop_index('ix_Venue_genres', table_name='Venue')
+    op.drop_index('ix_Show_artist_id_start_time', table_name='Show')
+    op.drop_index('ix_Show_venue_id_start_time', table_name='Show')
+    op.alter_column('Artist', 'genres',
+                    existing_type=sa.ARRAY(sa.String()),
+                    type_=sa.String(length=120),
+                    postgresql_using='genres::varchar')
@@ -0,0 +1,35 @@
+"""import checkpoints and partner ids
+
+Revision ID: 7c3e9a1f5b20
+Revises: d41f7c2b9e63
+Create Date: 2026-10-18 18:05:37.412903
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c3e9a1f5b20'
+down_revision = 'd41f7c2b9e63'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ImportCheckpoint',
+    sa.Column('name', sa.String(length=500), nullable=False),
+    sa.Column('rows', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.create_table('ImportedId',
+    sa.Column('entity', sa.String(length=16), nullable=False),
+    sa.Column('source_id', sa.String(length=120), nullable=False),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('entity', 'source_id')
+    )
+
+
+def downgrade():
+    op.drop_table('ImportedId')
+    op.drop_table('ImportCheckpoint')
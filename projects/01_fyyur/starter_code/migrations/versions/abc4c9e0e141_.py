@@ -0,0 +1,30 @@
+"""precomputed upcoming show counters
+
+Revision ID: abc4c9e0e141
+Revises: 566716b34891
+Create Date: 2026-10-18 12:20:05.918342
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'abc4c9e0e141'
+down_revision = '566716b34891'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('Venue', sa.Column('upcoming_show_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('Artist', sa.Column('upcoming_show_count', sa.Integer(), server_default='0', nullable=False))
+    op.execute('UPDATE "Venue" SET upcoming_show_count = '
+               '(SELECT count(*) FROM "Show" WHERE "Show".venue_id = "Venue".id AND "Show".start_time > now())')
+    op.execute('UPDATE "Artist" SET upcoming_show_count = '
+               '(SELECT count(*) FROM "Show" WHERE "Show".artist_id = "Artist".id AND "Show".start_time > now())')
+
+
+def downgrade():
+    op.drop_column('Artist', 'upcoming_show_count')
+    op.drop_column('Venue', 'upcoming_show_count')
@@ -0,0 +1,28 @@
+"""trigram indexes for venue and artist name search
+
+Revision ID: b602fd397412
+Revises: f50cfcf5ef6e
+Create Date: 2026-10-18 10:12:31.204117
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b602fd397412'
+down_revision = 'f50cfcf5ef6e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_index('ix_Venue_name_trgm', 'Venue', ['name'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+    op.create_index('ix_Artist_name_trgm', 'Artist', ['name'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
+
+def downgrade():
+    op.drop_index('ix_Artist_name_trgm', table_name='Artist')
+    op.drop_index('ix_Venue_name_trgm', table_name='Venue')
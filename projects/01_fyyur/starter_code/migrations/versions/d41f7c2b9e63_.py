@@ -0,0 +1,35 @@
+"""area summary for the venues listing
+
+Revision ID: d41f7c2b9e63
+Revises: abc4c9e0e141
+Create Date: 2026-10-18 15:42:11.204518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd41f7c2b9e63'
+down_revision = 'abc4c9e0e141'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('Area',
+    sa.Column('state', sa.String(length=120), nullable=False),
+    sa.Column('city', sa.String(length=120), nullable=False),
+    sa.Column('venue_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('upcoming_show_count', sa.Integer(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('state', 'city')
+    )
+    op.create_index('ix_Venue_state_city', 'Venue', ['state', 'city', 'id'], unique=False)
+    op.execute('INSERT INTO "Area" (state, city, venue_count, upcoming_show_count) '
+               'SELECT state, city, count(*), coalesce(sum(upcoming_show_count), 0) FROM "Venue" '
+               'WHERE state IS NOT NULL AND city IS NOT NULL GROUP BY state, city')
+
+
+def downgrade():
+    op.drop_index('ix_Venue_state_city', table_name='Venue')
+    op.drop_table('Area')
@@ -0,0 +1,29 @@
+"""cache generation
+
+Revision ID: e2b8d4c6a913
+Revises: 7c3e9a1f5b20
+Create Date: 2026-10-18 21:14:09.238417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2b8d4c6a913'
+down_revision = '7c3e9a1f5b20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('CacheGeneration',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('generation', sa.Integer(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute('INSERT INTO "CacheGeneration" (id, generation) VALUES (1, 0)')
+
+
+def downgrade():
+    op.drop_table('CacheGeneration')
@@ -0,0 +1,28 @@
+from bisect import bisect_right, insort
+from collections import defaultdict
+
+
+class BookingCalendar:
+    """Sorted start times per venue and per artist for double-booking checks.
+
+    Every show occupies a slot of the same length starting at its start
+    time, so two shows overlap exactly when their start times are less than
+    one slot apart. Keys are ('venue', id) or ('artist', id).
+    """
+
+    def __init__(self, slot):
+        self.slot = slot
+        self._starts = defaultdict(list)
+
+    def add(self, key, start_time):
+        insort(self._starts[key], start_time)
+
+    def conflict(self, key, start_time):
+        """Return the start time of a booking overlapping start_time, if any."""
+        starts = self._starts.get(key)
+        if not starts:
+            return None
+        i = bisect_right(starts, start_time - self.slot)
+        if i < len(starts) and starts[i] < start_time + self.slot:
+            return starts[i]
+        return None
@@ -0,0 +1,157 @@
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    if not text:
+        return []
+    return TOKEN_RE.findall(text.casefold())
+
+
+class SearchIndex:
+    """In-process inverted index over one entity type (Venue or Artist).
+
+    Every token of the name, city, state and genres of a row is mapped to a
+    sorted array of row ids. The index is kept current by calling add() and
+    remove() from the write handlers of its own process. Each worker process
+    keeps its own copy, so writes made by other processes (other workers,
+    `flask fyyur import`, `flask fyyur generate`) are only seen once
+    refresh() reads the rows again, at most `reload_interval` seconds after
+    the previous load. Until then search() can return ids deleted elsewhere
+    and misses rows added elsewhere.
+    """
+
+    def __init__(self, reload_interval=300):
+        self.reload_interval = reload_interval
+        self.loaded = False
+        self.loaded_at = None
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._postings = {}
+        self._vocabulary = []
+        self._documents = {}
+        self._names = {}
+        # (doc_id, row or None) of the add() and remove() calls made while
+        # load() reads its rows, replayed over the rows once they are read
+        self._changes = None
+
+    @property
+    def stale(self):
+        return not self.loaded or time.monotonic() >= self.loaded_at + self.reload_interval
+
+    def refresh(self, rows):
+        """Load rows() if the index was never loaded or is stale.
+
+        Only one thread loads; while it does, the others keep searching the
+        previous rows instead of waiting, unless there are none yet.
+        """
+        if not self.stale or not self._load_lock.acquire(blocking=not self.loaded):
+            return
+        try:
+            if self.stale:
+                self.load(rows())
+        finally:
+            self._load_lock.release()
+
+    def load(self, rows):
+        """Fill the index from (id, name, city, state, genres) rows."""
+        with self._lock:
+            self._changes = []
+        # built aside so searches are not blocked while the rows are read
+        fresh = SearchIndex()
+        try:
+            for row in rows:
+                fresh._add(*row)
+        except BaseException:
+            with self._lock:
+                self._changes = None
+            raise
+        with self._lock:
+            self._postings = fresh._postings
+            self._vocabulary = fresh._vocabulary
+            self._documents = fresh._documents
+            self._names = fresh._names
+            for doc_id, row in self._changes:
+                self._remove(doc_id)
+                if row is not None:
+                    self._add(doc_id, *row)
+            self._changes = None
+            self.loaded = True
+            self.loaded_at = time.monotonic()
+
+    def add(self, doc_id, name, city, state, genres):
+        """Index a row, replacing whatever was indexed for doc_id before."""
+        with self._lock:
+            self._remove(doc_id)
+            self._add(doc_id, name, city, state, genres)
+            if self._changes is not None:
+                self._changes.append((doc_id, (name, city, state, genres)))
+
+    def remove(self, doc_id):
+        with self._lock:
+            self._remove(doc_id)
+            if self._changes is not None:
+                self._changes.append((doc_id, None))
+
+    def search(self, query):
+        """Return the ids matching every term of query, ordered by name.
+
+        Each term is matched as a prefix of the indexed tokens, so "mus"
+        finds "The Musical Hop". An empty query matches every row.
+        """
+        terms = sorted(set(tokenize(query)))
+        with self._lock:
+            if not terms:
+                ids = list(self._documents)
+            else:
+                matches = sorted((self._prefix_ids(term) for term in terms), key=len)
+                ids = matches[0]
+                for other in matches[1:]:
+                    if not ids:
+                        break
+                    ids = ids & other
+            return sorted(ids, key=lambda doc_id: (self._names[doc_id], doc_id))
+
+    def _prefix_ids(self, prefix):
+        ids = set()
+        i = bisect_left(self._vocabulary, prefix)
+        while i < len(self._vocabulary) and self._vocabulary[i].startswith(prefix):
+            ids.update(self._postings[self._vocabulary[i]])
+            i += 1
+        return ids
+
+    def _add(self, doc_id, name, city, state, genres):
+        tokens = set(tokenize(name))
+        tokens.update(tokenize(city))
+        tokens.update(tokenize(state))
+        for genre in genres or []:
+            tokens.update(tokenize(genre))
+
+        for token in tokens:
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = array('l')
+                self._vocabulary.insert(bisect_left(self._vocabulary, token), token)
+            postings.insert(bisect_left(postings, doc_id), doc_id)
+
+        self._documents[doc_id] = tokens
+        self._names[doc_id] = (name or '').casefold()
+
+    def _remove(self, doc_id):
+        tokens = self._documents.pop(doc_id, None)
+        if tokens is None:
+            return
+        del self._names[doc_id]
+
+        for token in tokens:
+            postings = self._postings[token]
+            del postings[bisect_left(postings, doc_id)]
+            if not postings:
+                del self._postings[token]
+                del self._vocabulary[bisect_left(self._vocabulary, token)]
@@ -0,0 +1,32 @@
+import heapq
+from collections import Counter
+
+
+class UpcomingShowSweeper:
+    """Time ordered heap of upcoming shows waiting to become past shows.
+
+    Venue.upcoming_show_count and Artist.upcoming_show_count are incremented
+    when an upcoming show is created. pop_due() hands back the shows whose
+    start time has passed so their counters can be decremented, grouped per
+    venue and per artist. Only one sweeper may run against a database.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self.last_show_id = 0
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, show_id, start_time, venue_id, artist_id):
+        heapq.heappush(self._heap, (start_time, show_id, venue_id, artist_id))
+        self.last_show_id = max(self.last_show_id, show_id)
+
+    def pop_due(self, now):
+        venues = Counter()
+        artists = Counter()
+        while self._heap and self._heap[0][0] <= now:
+            _, _, venue_id, artist_id = heapq.heappop(self._heap)
+            venues[venue_id] += 1
+            artists[artist_id] += 1
+        return venues, artists
@@ -0,0 +1,243 @@
+"""Synthetic venues, artists and shows shaped like production data.
+
+    flask fyyur generate --venues 100000 --artists 500000 --shows 10000000
+    flask fyyur generate --shows 1000000 --seed 7 --truncate
+
+Popularity is skewed: the venue and the artist of every show are drawn from
+Zipf distributions (--skew is the exponent), so a few venues host most of
+the shows and the long tail hosts one or two, the shape that makes venue
+pages and the /venues listing slow. Ranks are shuffled so popularity does
+not follow the id order. Genres are one to three distinct values from
+genres_choices, states come from state_choices (also Zipf weighted) and
+cities from a per-state list. Shows spread over --past-days before today
+and --future-days after it, with --future-share of them upcoming, in the
+evening hours.
+
+Rows are generated with NumPy a batch at a time and loaded with COPY FROM
+STDIN on Postgres (executemany INSERTs elsewhere), one transaction per
+batch. Upcoming show counters are recounted and the tables analyzed at the
+end. The same --seed gives the same rows.
+"""
+import io
+import time
+from datetime import datetime, timedelta
+
+import click
+from sqlalchemy import select, text
+
+from forms import genres_choices, state_choices
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+GENRES = [value for value, _ in genres_choices]
+STATES = [value for value, _ in state_choices]
+GENRE_COUNT_WEIGHTS = (0.5, 0.35, 0.15)
+CITIES_PER_STATE = 40
+CITY_NAMES = [
+    'Springfield', 'Franklin', 'Greenville', 'Bristol', 'Clinton', 'Fairview', 'Salem', 'Madison',
+    'Georgetown', 'Arlington', 'Ashland', 'Dover', 'Oxford', 'Jackson', 'Burlington', 'Manchester',
+    'Milton', 'Newport', 'Auburn', 'Dayton',
+]
+ADJECTIVES = ['Blue', 'Velvet', 'Electric', 'Golden', 'Rusty', 'Midnight', 'Wild', 'Silver', 'Crimson', 'Lucky']
+VENUE_NOUNS = ['Room', 'Hall', 'Lounge', 'Tavern', 'Garden', 'Warehouse', 'Club', 'Theatre', 'Cellar', 'Hop']
+ARTIST_NOUNS = ['Band', 'Collective', 'Trio', 'Quartet', 'Orchestra', 'Ensemble', 'Project', 'Kids', 'Machine', 'Sax']
+STREETS = ['Main St', 'Oak Ave', 'Market St', 'Broadway', 'Elm St', 'Park Ave', '2nd St', 'Mill Rd']
+# shows start on the hour or half hour between 17:00 and 23:30, mostly at 20:00
+SHOW_HOURS = (17, 18, 19, 20, 21, 22, 23)
+SHOW_HOUR_WEIGHTS = (0.05, 0.1, 0.2, 0.3, 0.2, 0.1, 0.05)
+COPY_NULL = '\\N'
+
+
+def zipf_cdf(n, skew, rng):
+    """Cumulative probabilities of n items with Zipf weights in a shuffled rank order."""
+    weights = 1.0 / np.arange(1, n + 1) ** skew
+    rng.shuffle(weights)
+    cdf = np.cumsum(weights)
+    return cdf / cdf[-1]
+
+
+def draw(cdf, size, rng):
+    """size indices into the items of cdf."""
+    return np.minimum(np.searchsorted(cdf, rng.random(size), side='right'), len(cdf) - 1)
+
+
+def draw_genres(size, genre_cdf, rng):
+    """One to three distinct genres per row, weighted by genre_cdf."""
+    weights = np.diff(genre_cdf, prepend=0.0)
+    # Gumbel top-k: the k largest perturbed log weights are a weighted sample without replacement
+    scores = np.log(weights) - np.log(-np.log(rng.random((size, len(GENRES)))))
+    picked = np.array(GENRES, dtype=object)[np.argsort(-scores, axis=1)[:, :len(GENRE_COUNT_WEIGHTS)]]
+    counts = rng.choice(np.arange(1, len(GENRE_COUNT_WEIGHTS) + 1), size, p=GENRE_COUNT_WEIGHTS)
+    return [row[:count] for row, count in zip(picked.tolist(), counts.tolist())]
+
+
+def draw_places(size, state_cdf, rng):
+    """(cities, states) arrays; each state has CITIES_PER_STATE cities, the first ones the largest."""
+    states = np.array(STATES, dtype=object)[draw(state_cdf, size, rng)]
+    ranks = 1.0 / np.arange(1, CITIES_PER_STATE + 1)
+    cities = np.array([
+        CITY_NAMES[k % len(CITY_NAMES)] + ('' if k < len(CITY_NAMES) else ' {}'.format(k // len(CITY_NAMES) + 1))
+        for k in range(CITIES_PER_STATE)
+    ], dtype=object)[draw(np.cumsum(ranks) / ranks.sum(), size, rng)]
+    return cities, states
+
+
+def entity_batch(kind, start, size, genre_cdf, state_cdf, rng):
+    """Column arrays for size venues or artists numbered from start."""
+    nouns = VENUE_NOUNS if kind == 'venue' else ARTIST_NOUNS
+    numbers = np.arange(start, start + size)
+    names = [
+        'The {} {} {}'.format(adjective, noun, n) for adjective, noun, n in zip(
+            np.array(ADJECTIVES)[rng.integers(len(ADJECTIVES), size=size)].tolist(),
+            np.array(nouns)[rng.integers(len(nouns), size=size)].tolist(),
+            numbers.tolist())
+    ]
+    slugs = ['{}{}'.format(kind, n) for n in numbers.tolist()]
+    cities, states = draw_places(size, state_cdf, rng)
+    seeking = rng.random(size) < 0.3
+    columns = {
+        'name': names,
+        'genres': draw_genres(size, genre_cdf, rng),
+        'city': cities.tolist(),
+        'state': states.tolist(),
+        'phone': rng.integers(2000000000, 9999999999, size=size).astype(str).tolist(),
+        'image_link': ['https://images.example.com/{}.jpg'.format(slug) for slug in slugs],
+        'facebook_link': ['https://www.facebook.com/{}'.format(slug) for slug in slugs],
+        'website': [None if r < 0.4 else 'https://{}.example.com'.format(slug)
+                    for r, slug in zip(rng.random(size).tolist(), slugs)],
+        'seeking_description': [
+            'Looking for {} to play with.'.format('artists' if kind == 'venue' else 'a venue') if s else None
+            for s in seeking.tolist()
+        ],
+    }
+    if kind == 'venue':
+        columns['address'] = ['{} {}'.format(n, street) for n, street in zip(
+            rng.integers(1, 2000, size=size).tolist(), np.array(STREETS)[rng.integers(len(STREETS), size=size)].tolist())]
+        columns['seeking_talent'] = seeking
+    else:
+        columns['seeking_venue'] = seeking
+    return columns
+
+
+def show_batch(size, venue_cdf, artist_cdf, today, past_days, future_days, future_share, rng):
+    """Column arrays for size shows; venue_id and artist_id are indices into the loaded ids."""
+    upcoming = rng.random(size) < future_share
+    days = np.where(upcoming, rng.integers(1, future_days + 1, size=size), -rng.integers(0, past_days, size=size))
+    minutes = rng.choice(np.array(SHOW_HOURS) * 60, size, p=SHOW_HOUR_WEIGHTS) + 30 * rng.integers(2, size=size)
+    return {
+        'venue_id': draw(venue_cdf, size, rng),
+        'artist_id': draw(artist_cdf, size, rng),
+        'start_time': np.datetime64(today, 'm') + (days * 24 * 60 + minutes).astype('timedelta64[m]'),
+    }
+
+
+def array_literal(values):
+    return '{' + ','.join('"{}"'.format(value) for value in values) + '}'
+
+
+def copy_column(values):
+    """The COPY text format of one column."""
+    if isinstance(values, np.ndarray):
+        if values.dtype.kind == 'M':
+            return np.datetime_as_string(values, unit='s').tolist()
+        if values.dtype.kind == 'b':
+            return np.where(values, 't', 'f').tolist()
+        return values.astype(str).tolist()
+    return [COPY_NULL if value is None else array_literal(value) if isinstance(value, list) else value
+            for value in values]
+
+
+def load_batch(db, table, columns):
+    names = list(columns)
+    connection = db.session.connection()
+    if connection.dialect.name == 'postgresql':
+        cursor = connection.connection.cursor()
+        if hasattr(cursor, 'copy_expert'):
+            lines = map('\t'.join, zip(*(copy_column(columns[name]) for name in names)))
+            buffer = io.StringIO('\n'.join(lines) + '\n')
+            cursor.copy_expert('COPY "{}" ({}) FROM STDIN'.format(table.name, ', '.join(names)), buffer)
+            return
+    values = [columns[name].tolist() if isinstance(columns[name], np.ndarray) else columns[name] for name in names]
+    db.session.execute(table.insert(), [dict(zip(names, row)) for row in zip(*values)])
+
+
+def load_entities(db, model, kind, count, batch_size, genre_cdf, state_cdf, rng, echo):
+    """Load count rows of model and return their ids in load order."""
+    table = model.__table__
+    before = db.session.query(db.func.coalesce(db.func.max(model.id), 0)).scalar()
+    started = time.perf_counter()
+    for start in range(0, count, batch_size):
+        load_batch(db, table, entity_batch(kind, start, min(batch_size, count - start), genre_cdf, state_cdf, rng))
+        db.session.commit()
+        done = min(count, start + batch_size)
+        echo('{} {}s loaded, {:.0f} rows/s'.format(done, kind, done / (time.perf_counter() - started)))
+    ids = db.session.execute(select(table.c.id).where(table.c.id > before).order_by(table.c.id)).scalars().all()
+    return np.array(ids, dtype=np.int64)
+
+
+def generate(venues, artists, shows, seed=0, skew=1.1, past_days=730, future_days=180, future_share=0.2,
+             batch_size=100000, truncate=False, echo=click.echo):
+    """Generate and load the rows; needs an app context."""
+    if np is None:
+        raise click.ClickException('fyyur generate needs NumPy: pip install numpy')
+    from app import db, Venue, Artist, Show, ImportCheckpoint, ImportedId, recount_upcoming_shows, cache
+
+    rng = np.random.default_rng(seed)
+    if truncate:
+        if db.engine.dialect.name == 'postgresql':
+            db.session.execute(text('TRUNCATE "Show", "Artist", "Venue", "ImportedId", "ImportCheckpoint" RESTART IDENTITY'))
+        else:
+            for model in (Show, Artist, Venue, ImportedId, ImportCheckpoint):
+                db.session.query(model).delete()
+        db.session.commit()
+
+    genre_cdf = zipf_cdf(len(GENRES), 1.0, rng)
+    state_cdf = zipf_cdf(len(STATES), 1.0, rng)
+    venue_ids = load_entities(db, Venue, 'venue', venues, batch_size, genre_cdf, state_cdf, rng, echo)
+    artist_ids = load_entities(db, Artist, 'artist', artists, batch_size, genre_cdf, state_cdf, rng, echo)
+
+    if shows and (not len(venue_ids) or not len(artist_ids)):
+        raise click.ClickException('shows need at least one venue and one artist')
+    if shows:
+        venue_cdf = zipf_cdf(len(venue_ids), skew, rng)
+        artist_cdf = zipf_cdf(len(artist_ids), skew, rng)
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    started = time.perf_counter()
+    for start in range(0, shows, batch_size):
+        batch = show_batch(min(batch_size, shows - start), venue_cdf, artist_cdf, today,
+                           past_days, future_days, future_share, rng)
+        batch['venue_id'] = venue_ids[batch['venue_id']]
+        batch['artist_id'] = artist_ids[batch['artist_id']]
+        load_batch(db, Show.__table__, batch)
+        db.session.commit()
+        done = min(shows, start + batch_size)
+        echo('{} shows loaded, {:.0f} rows/s'.format(done, done / (time.perf_counter() - started)))
+
+    recount_upcoming_shows(datetime.now())
+    db.session.commit()
+    if db.engine.dialect.name == 'postgresql':
+        db.session.execute(text('ANALYZE "Venue", "Artist", "Show"'))
+        db.session.commit()
+    cache.clear()
+
+
+@click.command('generate')
+@click.option('--venues', default=1000, show_default=True, type=click.IntRange(min=0))
+@click.option('--artists', default=5000, show_default=True, type=click.IntRange(min=0))
+@click.option('--shows', default=100000, show_default=True, type=click.IntRange(min=0))
+@click.option('--seed', default=0, show_default=True)
+@click.option('--skew', default=1.1, show_default=True, help='Zipf exponent of shows per venue and artist.')
+@click.option('--past-days', default=730, show_default=True)
+@click.option('--future-days', default=180, show_default=True)
+@click.option('--future-share', default=0.2, show_default=True, help='Fraction of shows that are upcoming.')
+@click.option('--batch-size', default=100000, show_default=True, type=click.IntRange(min=1))
+@click.option('--truncate', is_flag=True, help='Empty the venue, artist and show tables (and the import checkpoints and partner ids) first.')
+def generate_data(venues, artists, shows, seed, skew, past_days, future_days, future_share, batch_size, truncate):
+    """Load synthetic venues, artists and shows."""
+    started = time.perf_counter()
+    generate(venues, artists, shows, seed=seed, skew=skew, past_days=past_days, future_days=future_days,
+             future_share=future_share, batch_size=batch_size, truncate=truncate)
+    click.echo('done in {}'.format(timedelta(seconds=round(time.perf_counter() - started))))
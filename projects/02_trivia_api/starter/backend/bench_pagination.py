@@ -0,0 +1,137 @@
+"""Benchmark for the question listings and search at 1000x the trivia data.
+
+Loads the categories and questions of trivia.psql into the database given on
+the command line, repeating the questions SCALE times, then prints p50/p99
+latencies for:
+
+    load everything   every Question loaded, sliced and counted in Python
+    /questions        deep page by ?page= (offset) and by ?after= (keyset)
+    category listing  /categories/<id>/questions by ?after=
+    search            POST /questions, without and with the trigram index
+
+Use a throwaway database; the search comparison needs Postgres:
+
+    createdb trivia_bench
+    python bench_pagination.py postgresql://localhost:5432/trivia_bench --scale 1000
+"""
+import argparse
+import random
+import time
+
+from sqlalchemy import text
+
+import flaskr
+from models import setup_db, db, Question, Category
+
+SEED_FILE = 'trivia.psql'
+BATCH_SIZE = 5000
+MIGRATION = 'migrations/0001_questions_question_trgm.sql'
+
+
+def read_copy(table):
+    """Rows of the COPY block for table in trivia.psql."""
+    rows, copying = [], False
+    with open(SEED_FILE) as seed:
+        for line in seed:
+            line = line.rstrip('\n')
+            if line.startswith('COPY public.{} '.format(table)):
+                copying = True
+            elif copying and line == '\\.':
+                break
+            elif copying:
+                rows.append(line.split('\t'))
+    return rows
+
+
+def seed(scale):
+    db.drop_all()
+    db.create_all()
+    db.session.execute(Category.__table__.insert(), [
+        {'id': int(id), 'type': type} for id, type in read_copy('categories')])
+
+    questions = read_copy('questions')
+    rows = [{
+        'question': '{} ({})'.format(question, n),
+        'answer': answer,
+        'difficulty': int(difficulty),
+        'category': category,
+    } for n in range(scale) for _, question, answer, difficulty, category in questions]
+    for start in range(0, len(rows), BATCH_SIZE):
+        db.session.execute(Question.__table__.insert(), rows[start:start + BATCH_SIZE])
+    db.session.commit()
+    return len(rows)
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+def measure(label, request, requests):
+    samples = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        request()
+        samples.append((time.perf_counter() - started) * 1000)
+    print('{:<28} p50 {:8.2f} ms   p99 {:8.2f} ms'.format(label, percentile(samples, 50), percentile(samples, 99)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('database_url')
+    parser.add_argument('--scale', type=int, default=1000)
+    parser.add_argument('--requests', type=int, default=50)
+    args = parser.parse_args()
+
+    # create_app() binds the default trivia database; bind the benchmark one instead
+    flaskr.setup_db = lambda app: setup_db(app, args.database_url)
+    app = flaskr.create_app()
+    client = app.test_client()
+    postgres = args.database_url.startswith('postgres')
+
+    with app.app_context():
+        total = seed(args.scale)
+        if postgres:
+            db.session.execute(text('ANALYZE'))
+            db.session.commit()
+        print('{:,} questions'.format(total))
+
+        last_page = total // flaskr.QUESTIONS_PER_PAGE
+        deep_id = Question.query.order_by(Question.id).offset(total - 20).first().id
+
+        def load_everything():
+            questions = Question.query.order_by(Question.id).all()
+            page = questions[(last_page - 1) * flaskr.QUESTIONS_PER_PAGE:][:flaskr.QUESTIONS_PER_PAGE]
+            return [question.format() for question in page], len(questions)
+
+        measure('load everything', load_everything, max(1, args.requests // 10))
+        measure('/questions?page=<last>', lambda: client.get('/questions?page={}'.format(last_page)), args.requests)
+        measure('/questions?after=<deep id>', lambda: client.get('/questions?after={}'.format(deep_id)), args.requests)
+        measure('/categories/<id>/questions',
+                lambda: client.get('/categories/{}/questions?after={}'.format(random.randint(1, 6), deep_id // 2)),
+                args.requests)
+
+        def search():
+            return client.post('/questions', json={'searchTerm': 'title'})
+
+        if not postgres:
+            measure('search', search, args.requests)
+            return
+
+        for statement in ('DROP INDEX IF EXISTS ix_questions_question_trgm',
+                          'DROP INDEX IF EXISTS ix_questions_category_id'):
+            db.session.execute(text(statement))
+        db.session.commit()
+        measure('search, no trigram index', search, args.requests)
+
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+            with open(MIGRATION) as migration:
+                sql = '\n'.join(line for line in migration if not line.startswith('--'))
+            for statement in filter(None, (part.strip() for part in sql.split(';'))):
+                connection.execute(text(statement))
+            connection.execute(text('ANALYZE questions'))
+        measure('search, trigram index', search, args.requests)
+
+
+if __name__ == '__main__':
+    main()
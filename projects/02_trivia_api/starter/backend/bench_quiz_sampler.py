@@ -0,0 +1,57 @@
+"""Quiz question selection at 1M questions: sampler against filtering in Python.
+
+Builds 1M (id, category) rows in memory across the six trivia categories and
+times picking a question for a quiz that has already asked 0, 5 and 1000
+questions, both with QuestionSampler and the way a straightforward /quizzes
+does it (load every question, filter out the category and the previous
+questions, random.choice). No database is needed.
+
+    python bench_quiz_sampler.py --questions 1000000
+"""
+import argparse
+import random
+import time
+
+from sampler import QuestionSampler
+
+CATEGORIES = ['1', '2', '3', '4', '5', '6']
+
+
+def timed(f, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        f()
+    return (time.perf_counter() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--questions', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=1000)
+    args = parser.parse_args()
+
+    random.seed(0)
+    rows = [(i, random.choice(CATEGORIES)) for i in range(1, args.questions + 1)]
+
+    sampler = QuestionSampler()
+    started = time.perf_counter()
+    sampler.load(rows)
+    print('load {:,} ids: {:.0f} ms'.format(len(rows), (time.perf_counter() - started) * 1000))
+
+    print('{:>9} {:>16} {:>16}'.format('previous', 'filter (ms)', 'sampler (us)'))
+    for asked in (0, 5, 1000):
+        previous = [question_id for question_id, category in rows if category == '1'][:asked]
+        previous_set = set(previous)
+
+        def filter_all():
+            candidates = [question_id for question_id, category in rows
+                          if category == '1' and question_id not in previous_set]
+            return random.choice(candidates)
+
+        naive = timed(filter_all, max(1, args.repeat // 200))
+        sampled = timed(lambda: sampler.sample('1', previous), args.repeat)
+        print('{:>9} {:>16.1f} {:>16.1f}'.format(asked, naive * 1000, sampled * 1e6))
+
+
+if __name__ == '__main__':
+    main()
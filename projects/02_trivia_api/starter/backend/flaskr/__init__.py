@@ -2,9 +2,14 @@ import os
 from flask import Flask, request, abort, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
+from sqlalchemy import func
 import random
 
-from models import setup_db, Question, Category
+from models import setup_db, db, Question, Category, table_versions, question_sampler, question_counts
+from conditional import conditional
+from pagination import keyset_page
+from instrumentation import SQLInstrumentation
+from db_pool import pool_metrics
 
 QUESTIONS_PER_PAGE = 10
 
@@ -12,6 +17,7 @@ def create_app(test_config=None):
   # create and configure the app
   app = Flask(__name__)
   setup_db(app)
+  SQLInstrumentation(app).add_collector(pool_metrics)
   
   '''
   @TODO: Set up CORS. Allow '*' for origins. Delete the sample route after completing the TODOs
@@ -21,25 +27,74 @@ def create_app(test_config=None):
   @TODO: Use the after_request decorator to set Access-Control-Allow
   '''
 
-  '''
-  @TODO: 
-  Create an endpoint to handle GET requests 
+  categories_cache = {}
+
+  def categories_by_id():
+    # the category map is part of every listing; read it once per categories version
+    version = table_versions.version(Category.__tablename__)
+    if categories_cache.get('version') != version:
+      categories_cache['categories'] = {
+        category.id: category.type for category in Category.query.order_by(Category.id).all()
+      }
+      categories_cache['version'] = version
+    return categories_cache['categories']
+
+  def count_questions():
+    return db.session.query(Question.category, func.count(Question.id)).group_by(Question.category).all()
+
+  def question_page(category=None):
+    # ?after=<id> pages by key, ?page=<n> (the frontend) by offset
+    query = Question.query
+    if category is not None:
+      query = query.filter(Question.category == category)
+    after = request.args.get('after', type=int)
+    page = request.args.get('page', 1, type=int)
+    if page < 1:
+      abort(404)
+    offset = (page - 1) * QUESTIONS_PER_PAGE if after is None else 0
+    questions, next_after = keyset_page(query, Question.id, after, QUESTIONS_PER_PAGE, offset)
+    if not questions:
+      abort(404)
+
+    categories = categories_by_id()
+    return jsonify({
+      'success': True,
+      'questions': [question.format() for question in questions],
+      'total_questions': question_counts.get(category, count_questions, table_versions.version(Question.__tablename__)),
+      'current_category': categories.get(int(category)) if category is not None else None,
+      'categories': categories,
+      'next_after': next_after
+    })
+
+  '''
+  Endpoint to handle GET requests 
   for all available categories.
+  Answered with 304 while the If-None-Match ETag is current.
   '''
-
+  @app.route('/categories')
+  @conditional(table_versions, 'categories')
+  def get_categories():
+    return jsonify({
+      'success': True,
+      'categories': categories_by_id()
+    })
 
   '''
-  @TODO: 
-  Create an endpoint to handle GET requests for questions, 
+  Endpoint to handle GET requests for questions, 
   including pagination (every 10 questions). 
   This endpoint should return a list of questions, 
   number of total questions, current category, categories. 
+  Answered with 304 while the If-None-Match ETag is current.
 
   TEST: At this point, when you start the application
   you should see questions and categories generated,
   ten questions per page and pagination at the bottom of the screen for three pages.
   Clicking on the page numbers should update the questions. 
   '''
+  @app.route('/questions')
+  @conditional(table_versions, 'questions', 'categories')
+  def get_questions():
+    return question_page()
 
   '''
   @TODO: 
@@ -61,44 +116,134 @@ def create_app(test_config=None):
   '''
 
   '''
-  @TODO: 
-  Create a POST endpoint to get questions based on a search term. 
+  POST endpoint to get questions based on a search term. 
   It should return any questions for whom the search term 
   is a substring of the question. 
+  The ILIKE is served by the trigram index in
+  migrations/0001_questions_question_trgm.sql, and the total comes from
+  the same query with count() over ().
 
   TEST: Search by any phrase. The questions list will update to include 
   only question that include that string within their question. 
   Try using the word "title" to start. 
   '''
-
-  '''
-  @TODO: 
-  Create a GET endpoint to get questions based on category. 
+  @app.route('/questions', methods=['POST'])
+  def search_questions():
+    body = request.get_json(silent=True) or {}
+    search_term = body.get('searchTerm')
+    if not isinstance(search_term, str):
+      abort(422)
+    page = body.get('page', 1)
+    if not isinstance(page, int) or page < 1:
+      abort(422)
+
+    pattern = '%{}%'.format(search_term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_'))
+    rows = db.session.query(Question, func.count(Question.id).over()) \
+      .filter(Question.question.ilike(pattern, escape='\\')) \
+      .order_by(Question.id) \
+      .offset((page - 1) * QUESTIONS_PER_PAGE).limit(QUESTIONS_PER_PAGE).all()
+
+    return jsonify({
+      'success': True,
+      'questions': [question.format() for question, _ in rows],
+      'total_questions': rows[0][1] if rows else 0,
+      'current_category': None
+    })
+
+  '''
+  GET endpoint to get questions based on category. 
+  Paginated like /questions.
 
   TEST: In the "List" tab / main screen, clicking on one of the 
   categories in the left column will cause only questions of that 
   category to be shown. 
   '''
-
-
-  '''
-  @TODO: 
-  Create a POST endpoint to get questions to play the quiz. 
+  @app.route('/categories/<int:category_id>/questions')
+  @conditional(table_versions, 'questions', 'categories')
+  def get_category_questions(category_id):
+    if category_id not in categories_by_id():
+      abort(404)
+    return question_page(str(category_id))
+
+
+  def load_question_ids():
+    with app.app_context():
+      question_sampler.load(db.session.query(Question.id, Question.category).yield_per(10000))
+
+  def random_question(category, previous):
+    # cold sampler: a random offset into the matching questions, in id order
+    query = Question.query
+    if category is not None:
+      query = query.filter(Question.category == category)
+    if previous:
+      query = query.filter(~Question.id.in_(previous))
+    remaining = query.count()
+    if not remaining:
+      return None
+    return query.order_by(Question.id).offset(random.randrange(remaining)).first()
+
+  def next_question(category, previous):
+    question_sampler.warm(load_question_ids)
+    if not question_sampler.loaded:
+      return random_question(category, previous)
+
+    while True:
+      question_id = question_sampler.sample(category, previous)
+      if question_id is None:
+        return None
+      question = Question.query.get(question_id)
+      if question is not None:
+        return question
+      # deleted by another process since the ids were loaded
+      question_sampler.remove(question_id)
+
+  '''
+  POST endpoint to get questions to play the quiz. 
   This endpoint should take category and previous question parameters 
   and return a random questions within the given category, 
   if provided, and that is not one of the previous questions. 
+  The question is drawn from question_sampler (see sampler.py) without
+  reading the questions table.
 
   TEST: In the "Play" tab, after a user selects "All" or a category,
   one question at a time is displayed, the user is allowed to answer
   and shown whether they were correct or not. 
   '''
+  @app.route('/quizzes', methods=['POST'])
+  def play_quiz():
+    body = request.get_json(silent=True) or {}
+    try:
+      previous = [int(question_id) for question_id in body.get('previous_questions', [])]
+      category = int((body.get('quiz_category') or {}).get('id', 0))
+    except (TypeError, ValueError, AttributeError):
+      abort(422)
+
+    question = next_question(str(category) if category else None, previous)
+    return jsonify({
+      'success': True,
+      'question': question.format() if question else None
+    })
 
   '''
-  @TODO: 
-  Create error handlers for all expected errors 
+  Error handlers for all expected errors 
   including 404 and 422. 
   '''
-  
+  @app.errorhandler(404)
+  def not_found(error):
+    return jsonify({
+      'success': False,
+      'error': 404,
+      'message': 'resource not found'
+    }), 404
+
+  @app.errorhandler(422)
+  def unprocessable(error):
+    return jsonify({
+      'success': False,
+      'error': 422,
+      'message': 'unprocessable'
+    }), 422
+
   return app
 
     
\ No newline at end of file
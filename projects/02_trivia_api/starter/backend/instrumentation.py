@@ -0,0 +1,154 @@
+"""Per-request SQL and template instrumentation for Flask apps.
+
+    instrumentation = SQLInstrumentation(app)
+
+Counts the statements each request runs, the time spent in the database and
+in template rendering, and flags N+1 patterns: the same statement fingerprint
+repeated N_PLUS_ONE_THRESHOLD times or more within one request. Results are
+sent back in a Server-Timing header, aggregated per route at /debug/metrics
+in the Prometheus text format, and requests slower than SLOW_REQUEST_MS are
+logged.
+"""
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+
+from flask import current_app, g, has_request_context, request, Response, before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+IN_LIST_RE = re.compile(r'\bIN\s*\((?:[^()]|\([^()]*\))*\)', re.IGNORECASE)
+LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+SPACE_RE = re.compile(r'\s+')
+
+_listening = False
+_listening_lock = threading.Lock()
+
+
+def fingerprint(statement):
+    statement = IN_LIST_RE.sub('IN (?)', statement)
+    statement = LITERAL_RE.sub('?', statement)
+    return SPACE_RE.sub(' ', statement).strip()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # the start time lives on the execution context, which is discarded with
+    # it when the statement fails and after_cursor_execute never runs
+    if context is not None and has_request_context() and 'sql_stats' in g:
+        context.sql_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, 'sql_started', None)
+    if started is not None and has_request_context() and 'sql_stats' in g:
+        stats = g.sql_stats
+        stats['queries'] += 1
+        stats['db_time'] += time.perf_counter() - started
+        stats['fingerprints'][fingerprint(statement)] += 1
+
+
+class SQLInstrumentation:
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self.metrics = defaultdict(Counter)
+        self.collectors = []
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('N_PLUS_ONE_THRESHOLD', 5)
+        app.config.setdefault('SLOW_REQUEST_MS', None)
+        app.config.setdefault('SERVER_TIMING', True)
+        app.config.setdefault('METRICS_ENDPOINT', '/debug/metrics')
+
+        global _listening
+        with _listening_lock:
+            if not _listening:
+                event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+                event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+                _listening = True
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+        if app.config['METRICS_ENDPOINT']:
+            app.add_url_rule(app.config['METRICS_ENDPOINT'], 'debug_metrics', self.metrics_view)
+        app.extensions['sql_instrumentation'] = self
+
+    def add_collector(self, collect):
+        """Register a callable returning extra Prometheus text lines."""
+        self.collectors.append(collect)
+
+    def _before_request(self):
+        g.sql_stats = {
+            'started': time.perf_counter(),
+            'queries': 0,
+            'db_time': 0.0,
+            'render_time': 0.0,
+            'fingerprints': Counter(),
+        }
+
+    def _before_render(self, app, template, context, **extra):
+        if 'sql_stats' in g:
+            g.sql_stats['render_started'] = time.perf_counter()
+
+    def _after_render(self, app, template, context, **extra):
+        if 'sql_stats' in g and 'render_started' in g.sql_stats:
+            g.sql_stats['render_time'] += time.perf_counter() - g.sql_stats.pop('render_started')
+
+    def _after_request(self, response):
+        stats = g.pop('sql_stats', None)
+        if stats is None:
+            return response
+
+        config = current_app.config
+        total = time.perf_counter() - stats['started']
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        repeated = [(statement, count) for statement, count in stats['fingerprints'].most_common()
+                    if count >= config['N_PLUS_ONE_THRESHOLD']]
+
+        with self._lock:
+            metrics = self.metrics[route]
+            metrics['requests'] += 1
+            metrics['queries'] += stats['queries']
+            metrics['db_seconds'] += stats['db_time']
+            metrics['render_seconds'] += stats['render_time']
+            metrics['seconds'] += total
+            metrics['n_plus_one'] += 1 if repeated else 0
+
+        for statement, count in repeated:
+            current_app.logger.warning('N+1 on %s: %d x %s', route, count, statement)
+        if config['SLOW_REQUEST_MS'] is not None and total * 1000 >= config['SLOW_REQUEST_MS']:
+            current_app.logger.warning('slow request %s %s: %.1f ms, %d queries, %.1f ms db, %.1f ms render',
+                                       request.method, route, total * 1000, stats['queries'],
+                                       stats['db_time'] * 1000, stats['render_time'] * 1000)
+
+        if config['SERVER_TIMING']:
+            response.headers.add('Server-Timing', 'db;dur={:.2f};desc="{} queries"'.format(stats['db_time'] * 1000, stats['queries']))
+            response.headers.add('Server-Timing', 'render;dur={:.2f}'.format(stats['render_time'] * 1000))
+            response.headers.add('Server-Timing', 'total;dur={:.2f}'.format(total * 1000))
+        return response
+
+    def metrics_view(self):
+        lines = []
+        series = [
+            ('http_requests_total', 'requests', 'counter', 'Requests handled.'),
+            ('http_request_db_queries_total', 'queries', 'counter', 'SQL statements executed.'),
+            ('http_request_db_seconds_total', 'db_seconds', 'counter', 'Time spent executing SQL.'),
+            ('http_request_render_seconds_total', 'render_seconds', 'counter', 'Time spent rendering templates.'),
+            ('http_request_seconds_total', 'seconds', 'counter', 'Time spent handling requests.'),
+            ('http_request_n_plus_one_total', 'n_plus_one', 'counter', 'Requests with a repeated statement.'),
+        ]
+        with self._lock:
+            snapshot = {route: Counter(metrics) for route, metrics in self.metrics.items()}
+        for name, key, kind, help_text in series:
+            lines.append('# HELP {} {}'.format(name, help_text))
+            lines.append('# TYPE {} {}'.format(name, kind))
+            for route, metrics in sorted(snapshot.items()):
+                lines.append('{}{{route="{}"}} {}'.format(name, route.replace('"', '\\"'), metrics[key]))
+        for collect in self.collectors:
+            lines.extend(collect())
+        return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
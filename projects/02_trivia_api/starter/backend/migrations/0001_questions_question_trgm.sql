@@ -0,0 +1,21 @@
+-- Indexes for the question listings and search.
+--
+--   psql trivia < migrations/0001_questions_question_trgm.sql
+--
+-- POST /questions with a searchTerm filters on question ILIKE '%term%', which
+-- a btree cannot serve; the pg_trgm GIN index can. The category listings page
+-- by id within a category, which (category, id) serves as a range scan.
+-- CONCURRENTLY keeps the table writable while the indexes build, so run this
+-- file outside a transaction (psql's default).
+--
+-- To revert:
+--   DROP INDEX CONCURRENTLY IF EXISTS public.ix_questions_question_trgm;
+--   DROP INDEX CONCURRENTLY IF EXISTS public.ix_questions_category_id;
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_questions_question_trgm
+    ON public.questions USING gin (question gin_trgm_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_questions_category_id
+    ON public.questions (category, id);
@@ -1,13 +1,27 @@
 import os
-from sqlalchemy import Column, String, Integer, create_engine
+from sqlalchemy import Column, String, Integer, create_engine, inspect
 from flask_sqlalchemy import SQLAlchemy
 import json
 
+from db_pool import engine_options
+from conditional import TableVersions
+from sampler import QuestionSampler
+from pagination import CategoryCounts
+
 database_name = "trivia"
 database_path = "postgres://{}/{}".format('localhost:5432', database_name)
 
 db = SQLAlchemy()
 
+# bumped by the model write methods in the write's transaction, see conditional.py
+table_versions = TableVersions(db)
+
+# question ids per category for the quiz, kept current by Question writes
+question_sampler = QuestionSampler()
+
+# number of questions per category for the listings, kept current by Question writes
+question_counts = CategoryCounts()
+
 '''
 setup_db(app)
     binds a flask application and a SQLAlchemy service
@@ -15,6 +29,7 @@ setup_db(app)
 def setup_db(app, database_path=database_path):
     app.config["SQLALCHEMY_DATABASE_URI"] = database_path
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(database_path)
     db.app = app
     db.init_app(app)
     db.create_all()
@@ -40,14 +55,27 @@ class Question(db.Model):
 
   def insert(self):
     db.session.add(self)
+    table_versions.bump(self.__tablename__)
     db.session.commit()
+    question_sampler.add(self.id, self.category)
+    question_counts.add(self.category, 1)
   
   def update(self):
+    moved_from = inspect(self).attrs.category.history.deleted
+    table_versions.bump(self.__tablename__)
     db.session.commit()
+    if moved_from:
+      question_sampler.move(self.id, moved_from[0], self.category)
+      question_counts.add(moved_from[0], -1)
+      question_counts.add(self.category, 1)
 
   def delete(self):
+    id, category = self.id, self.category
     db.session.delete(self)
+    table_versions.bump(self.__tablename__)
     db.session.commit()
+    question_sampler.remove(id)
+    question_counts.add(category, -1)
 
   def format(self):
     return {
@@ -0,0 +1,65 @@
+"""Keyset pagination and cached per-category question counts.
+
+    questions, next_after = keyset_page(query, Question.id, after, QUESTIONS_PER_PAGE)
+    total = question_counts.get(category, load, table_versions.version('questions'))
+
+A keyset page is the rows with an id greater than the last one of the
+previous page, so any page costs one index range scan however deep it is,
+where OFFSET has to walk past every row before it. `next_after` is the id to
+pass as ?after= for the next page, or None on the last page. Page numbers
+(what the frontend sends) are still served with an offset.
+
+Counting the rows of a category on every listing doubles the work of the
+page query, so the counts of all categories are read with one GROUP BY and
+then kept current by Question.insert/update/delete. They are read again
+whenever the version passed to get() differs from the one they were read
+at, so a write of another process, which bumps the shared table version,
+is counted as soon as it changes the ETag of the listing; without a version
+they are read again every `reload_interval` seconds.
+"""
+import threading
+import time
+
+
+def keyset_page(query, key, after, per_page, offset=0):
+    if after is not None:
+        query = query.filter(key > after)
+    rows = query.order_by(key).offset(offset or None).limit(per_page + 1).all()
+    if len(rows) > per_page:
+        return rows[:per_page], getattr(rows[per_page - 1], key.key)
+    return rows, None
+
+
+class CategoryCounts:
+
+    def __init__(self, reload_interval=300):
+        self.reload_interval = reload_interval
+        self.loaded_at = None
+        self.version = None
+        self._counts = None
+        self._lock = threading.Lock()
+
+    def get(self, category, load, version=None):
+        """Number of rows in category (None for all), loading the counts with load() if needed.
+
+        version is the table version the caller read before loading; counts
+        read at another version are loaded again.
+        """
+        if self.loaded_at is None or version != self.version or \
+                time.monotonic() >= self.loaded_at + self.reload_interval:
+            counts = {}
+            for row_category, count in load():
+                counts[str(row_category)] = count
+            counts[None] = sum(counts.values())
+            with self._lock:
+                self._counts = counts
+                self.version = version
+                self.loaded_at = time.monotonic()
+        return self._counts.get(None if category is None else str(category), 0)
+
+    def add(self, category, delta):
+        with self._lock:
+            if self._counts is not None:
+                key = str(category)
+                self._counts[key] = self._counts.get(key, 0) + delta
+                self._counts[None] += delta
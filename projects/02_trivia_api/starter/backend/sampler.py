@@ -0,0 +1,129 @@
+"""Random quiz questions drawn from in-memory arrays of question ids.
+
+    question_sampler = QuestionSampler()
+    question_sampler.warm(load)          # load() calls question_sampler.load(rows)
+    question_id = question_sampler.sample(category, previous_questions)
+
+The ids of every question are kept in one array per category plus one for
+all categories, so picking a question is a random index into an array. Ids
+that were already asked (or deleted) are rejected and another index drawn,
+which is O(1) expected while most of the category is still unasked. When
+more than half of it has been asked, or too many draws were rejected, the
+remaining ids are listed and one is chosen from those instead.
+
+Question.insert/update/delete keep the arrays current. Deleted ids are kept
+in a tombstone set and the arrays are compacted once it grows past an
+eighth of the questions. The arrays are reloaded in the background every
+`reload_interval` seconds to pick up writes made by other processes. Until
+the first load finishes the sampler is cold and callers fall back to the
+database.
+"""
+import random
+import threading
+import time
+from array import array
+from collections import defaultdict
+
+
+class QuestionSampler:
+
+    def __init__(self, max_rejections=16, reload_interval=300):
+        self.max_rejections = max_rejections
+        self.reload_interval = reload_interval
+        self.loaded_at = None
+        self._ids = None
+        self._deleted = set()
+        self._pending = None
+        self._loading = False
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._ids is not None
+
+    def warm(self, load):
+        """Run load() in a background thread unless loaded recently or already loading."""
+        with self._lock:
+            fresh = self.loaded_at is not None and time.monotonic() < self.loaded_at + self.reload_interval
+            if self._loading or fresh:
+                return
+            self._loading = True
+        threading.Thread(target=self._run_load, args=(load,), daemon=True).start()
+
+    def _run_load(self, load):
+        try:
+            load()
+        finally:
+            with self._lock:
+                self._loading = False
+
+    def load(self, rows):
+        """Replace the arrays from (id, category) rows."""
+        with self._lock:
+            self._pending = []
+        ids = defaultdict(lambda: array('l'))
+        everything = array('l')
+        for question_id, category in rows:
+            ids[str(category)].append(question_id)
+            everything.append(question_id)
+        ids[None] = everything
+        with self._lock:
+            self._ids = dict(ids)
+            self._deleted = set()
+            # writes made while the rows were being read
+            for change in self._pending:
+                change()
+            self._pending = None
+            self.loaded_at = time.monotonic()
+
+    def add(self, question_id, category):
+        self._change(lambda: self._add(question_id, category))
+
+    def remove(self, question_id):
+        self._change(lambda: self._remove(question_id))
+
+    def move(self, question_id, old_category, new_category):
+        self._change(lambda: self._move(question_id, old_category, new_category))
+
+    def _change(self, change):
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(change)
+            if self._ids is not None:
+                change()
+
+    def _add(self, question_id, category):
+        self._ids.setdefault(str(category), array('l')).append(question_id)
+        self._ids[None].append(question_id)
+
+    def _remove(self, question_id):
+        self._deleted.add(question_id)
+        if len(self._deleted) > len(self._ids[None]) // 8:
+            self._ids = {
+                category: array('l', (i for i in ids if i not in self._deleted))
+                for category, ids in self._ids.items()
+            }
+            self._deleted = set()
+
+    def _move(self, question_id, old_category, new_category):
+        old = self._ids.get(str(old_category))
+        if old is not None and question_id in old:
+            old.remove(question_id)
+        self._ids.setdefault(str(new_category), array('l')).append(question_id)
+
+    def sample(self, category=None, previous=()):
+        """Return a random question id in category (None for all) not in previous, or None."""
+        previous = set(previous)
+        with self._lock:
+            ids = (self._ids or {}).get(None if category is None else str(category))
+            if not ids:
+                return None
+
+            if len(previous) * 2 < len(ids):
+                for _ in range(self.max_rejections):
+                    question_id = ids[random.randrange(len(ids))]
+                    if question_id not in previous and question_id not in self._deleted:
+                        return question_id
+
+            remaining = [i for i in ids if i not in previous and i not in self._deleted]
+        return random.choice(remaining) if remaining else None
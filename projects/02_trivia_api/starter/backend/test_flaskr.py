@@ -1,10 +1,18 @@
 import os
 import unittest
 import json
+from collections import Counter
+from unittest import mock
+from flask import g
 from flask_sqlalchemy import SQLAlchemy
 
 from flaskr import create_app
-from models import setup_db, Question, Category
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.pool import NullPool
+
+from models import setup_db, db, Question, Category, table_versions
+from db_pool import engine_options, pool_metrics, TimedQueuePool
+from instrumentation import fingerprint
 
 
 class TriviaTestCase(unittest.TestCase):
@@ -33,6 +41,247 @@ class TriviaTestCase(unittest.TestCase):
     TODO
     Write at least one test for each test for successful operation and for expected errors.
     """
+    def test_get_categories(self):
+        res = self.client().get('/categories')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertTrue(len(data['categories']))
+        self.assertEqual(res.headers['Cache-Control'], 'no-cache')
+        self.assertTrue(res.headers['Last-Modified'])
+
+    def test_categories_not_modified(self):
+        res = self.client().get('/categories')
+        res = self.client().get('/categories', headers={'If-None-Match': res.headers['ETag']})
+
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.data, b'')
+
+    def test_validators_of_unbumped_tables_are_the_same_in_every_process(self):
+        with self.app.app_context():
+            self.assertEqual(table_versions.validators(['never_bumped']), ('0.0', 0.0))
+
+    def test_get_paginated_questions(self):
+        res = self.client().get('/questions')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertTrue(data['total_questions'])
+        self.assertTrue(len(data['questions']))
+        self.assertTrue(len(data['categories']))
+
+    def test_404_sent_requesting_beyond_valid_page(self):
+        res = self.client().get('/questions?page=1000')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 404)
+        self.assertEqual(data['success'], False)
+        self.assertEqual(data['message'], 'resource not found')
+
+    def test_questions_etag_changes_after_insert(self):
+        etag = self.client().get('/questions').headers['ETag']
+        with self.app.app_context():
+            question = Question('Test question?', 'Test answer', '1', 1)
+            question.insert()
+            res = self.client().get('/questions', headers={'If-None-Match': etag})
+            question.delete()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res.headers['ETag'], etag)
+
+    def test_etag_follows_writes_of_other_processes(self):
+        with self.app.app_context():
+            table_versions.bump('questions')
+            db.session.commit()
+        etag = self.client().get('/questions').headers['ETag']
+        max_age, table_versions.max_age = table_versions.max_age, 0
+        try:
+            with self.app.app_context():
+                # what a Question write in another worker leaves behind
+                db.session.execute(text("UPDATE table_versions SET version = version + 1 WHERE name = 'questions'"))
+                db.session.commit()
+            res = self.client().get('/questions', headers={'If-None-Match': etag})
+        finally:
+            table_versions.max_age = max_age
+
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res.headers['ETag'], etag)
+
+    def test_total_follows_inserts_of_other_processes(self):
+        first = self.client().get('/questions')
+        max_age, table_versions.max_age = table_versions.max_age, 0
+        try:
+            with self.app.app_context():
+                # what Question.insert in another worker leaves behind: a new row
+                # and version, but no question_counts.add in this process
+                db.session.execute(text("INSERT INTO questions (question, answer, category, difficulty) "
+                                        "VALUES ('Who?', 'Me', '1', 1)"))
+                table_versions.bump('questions')
+                db.session.commit()
+            res = self.client().get('/questions', headers={'If-None-Match': first.headers['ETag']})
+        finally:
+            table_versions.max_age = max_age
+
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res.headers['ETag'], first.headers['ETag'])
+        self.assertEqual(json.loads(res.data)['total_questions'], json.loads(first.data)['total_questions'] + 1)
+
+    def test_get_questions_by_keyset(self):
+        first = json.loads(self.client().get('/questions').data)
+        res = self.client().get('/questions?after={}'.format(first['next_after']))
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['total_questions'], first['total_questions'])
+        self.assertTrue(all(question['id'] > first['next_after'] for question in data['questions']))
+
+    def test_get_questions_by_category(self):
+        res = self.client().get('/categories/1/questions')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['current_category'], 'Science')
+        self.assertTrue(all(str(question['category']) == '1' for question in data['questions']))
+        self.assertTrue(data['total_questions'] >= len(data['questions']))
+
+    def test_404_get_questions_by_unknown_category(self):
+        res = self.client().get('/categories/1000/questions')
+
+        self.assertEqual(res.status_code, 404)
+
+    def test_search_questions(self):
+        res = self.client().post('/questions', json={'searchTerm': 'title'})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(data['total_questions'])
+        self.assertTrue(all('title' in question['question'].lower() for question in data['questions']))
+
+    def test_search_questions_without_results(self):
+        res = self.client().post('/questions', json={'searchTerm': 'zzzzqqqq'})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['total_questions'], 0)
+        self.assertEqual(data['questions'], [])
+
+    def test_play_quiz(self):
+        res = self.client().post('/quizzes', json={
+            'previous_questions': [],
+            'quiz_category': {'type': 'Science', 'id': '1'}
+        })
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertEqual(str(data['question']['category']), '1')
+
+    def test_play_quiz_skips_previous_questions(self):
+        previous = []
+        while True:
+            res = self.client().post('/quizzes', json={
+                'previous_questions': previous,
+                'quiz_category': {'type': 'Science', 'id': '1'}
+            })
+            question = json.loads(res.data)['question']
+            if question is None:
+                break
+            self.assertNotIn(question['id'], previous)
+            previous.append(question['id'])
+
+        self.assertTrue(len(previous))
+
+    def test_422_play_quiz_with_invalid_previous_questions(self):
+        res = self.client().post('/quizzes', json={'previous_questions': 'all'})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 422)
+        self.assertEqual(data['success'], False)
+
+    def test_instrumentation_counts_the_queries_of_each_request(self):
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        with self.app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', record)
+        try:
+            res = self.client().get('/questions?page=2')
+        finally:
+            event.remove(engine, 'before_cursor_execute', record)
+
+        self.assertTrue(statements)
+        self.assertIn('desc="{} queries"'.format(len(statements)), res.headers.getlist('Server-Timing')[0])
+        metrics = self.app.extensions['sql_instrumentation'].metrics['/questions']
+        self.assertEqual(metrics['requests'], 1)
+        self.assertEqual(metrics['queries'], len(statements))
+
+    def test_instrumentation_aggregates_statements_by_fingerprint(self):
+        self.assertEqual(fingerprint("SELECT *  FROM questions\nWHERE id IN (1, 2, (3)) AND answer = 'it''s' LIMIT 10"),
+                         'SELECT * FROM questions WHERE id IN (?) AND answer = ? LIMIT ?')
+
+        instrumentation = self.app.extensions['sql_instrumentation']
+        with self.app.test_request_context('/questions'):
+            instrumentation._before_request()
+            for question_id in range(5):
+                db.session.execute(text('SELECT question FROM questions WHERE id = {}'.format(question_id)))
+            # a failing statement is not counted and leaves nothing behind
+            with self.assertRaises(Exception):
+                db.session.execute(text('SELECT question FROM no_such_table'))
+            db.session.rollback()
+            self.assertEqual(g.sql_stats['queries'], 5)
+            self.assertEqual(g.sql_stats['fingerprints'], Counter({'SELECT question FROM questions WHERE id = ?': 5}))
+            with self.assertLogs(self.app.logger, 'WARNING'):
+                instrumentation._after_request(self.app.response_class())
+        self.assertEqual(instrumentation.metrics['/questions']['n_plus_one'], 1)
+
+
+class DbPoolTestCase(unittest.TestCase):
+    """engine_options and pool_metrics of db_pool.py"""
+
+    def environ(self, **values):
+        names = ('DB_POOL_SIZE', 'DB_MAX_OVERFLOW', 'DB_POOL_TIMEOUT', 'DB_POOL_RECYCLE', 'DB_POOL_PRE_PING',
+                 'DB_STATEMENT_TIMEOUT', 'DB_TRANSACTION_POOLING')
+        return mock.patch.dict(os.environ, dict(dict.fromkeys(names, ''), **values))
+
+    def test_sqlite_keeps_the_default_pool(self):
+        with self.environ(DB_POOL_SIZE='20', DB_STATEMENT_TIMEOUT='5000'):
+            self.assertEqual(engine_options('sqlite:///trivia.db'), {})
+
+    def test_pool_settings_come_from_the_environment(self):
+        with self.environ():
+            options = engine_options('postgresql://localhost/trivia')
+        self.assertEqual(options, {'poolclass': TimedQueuePool, 'pool_size': 5, 'max_overflow': 10,
+                                   'pool_timeout': 30, 'pool_recycle': 1800, 'pool_pre_ping': True})
+
+        with self.environ(DB_POOL_SIZE='20', DB_MAX_OVERFLOW='0', DB_POOL_PRE_PING='0', DB_STATEMENT_TIMEOUT='5000'):
+            options = engine_options('postgresql://localhost/trivia')
+        self.assertEqual(options['pool_size'], 20)
+        self.assertEqual(options['max_overflow'], 0)
+        self.assertFalse(options['pool_pre_ping'])
+        self.assertEqual(options['connect_args'], {'options': '-c statement_timeout=5000'})
+
+    def test_transaction_pooling_keeps_no_connections(self):
+        with self.environ(DB_TRANSACTION_POOLING='1', DB_POOL_SIZE='20', DB_STATEMENT_TIMEOUT='5000'):
+            options = engine_options('postgresql://localhost/trivia')
+        self.assertEqual(options, {'poolclass': NullPool, 'execution_options': {'local_statement_timeout': 5000}})
+
+    def test_pool_metrics(self):
+        engine = create_engine('sqlite://', poolclass=TimedQueuePool, pool_size=2, max_overflow=2)
+        self.addCleanup(engine.dispose)
+        label = '{{pool="{}"}}'.format(id(engine.pool))
+        with engine.connect():
+            lines = pool_metrics()
+        self.assertIn('# TYPE db_pool_checkouts_total counter', lines)
+        self.assertIn('db_pool_checkouts_total{} 1'.format(label), lines)
+        self.assertIn('db_pool_checkout_timeouts_total{} 0'.format(label), lines)
+        self.assertIn('db_pool_checked_out{} 1'.format(label), lines)
+        self.assertIn('db_pool_utilization{} 0.25'.format(label), lines)
+        self.assertIn('db_pool_checked_out{} 0'.format(label), pool_metrics())
 
 
 # Make the tests conveniently executable
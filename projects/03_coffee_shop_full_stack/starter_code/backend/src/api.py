@@ -4,12 +4,18 @@ from sqlalchemy import exc
 import json
 from flask_cors import CORS
 
-from .database.models import db_drop_and_create_all, setup_db, Drink
-from .auth.auth import AuthError, requires_auth
+from .database.models import db_drop_and_create_all, setup_db, Drink, table_versions
+from .conditional import conditional
+from .auth.auth import AuthError, requires_auth, verified_tokens
+from .instrumentation import SQLInstrumentation
+from .database.db_pool import pool_metrics
 
 app = Flask(__name__)
 setup_db(app)
 CORS(app)
+instrumentation = SQLInstrumentation(app)
+instrumentation.add_collector(pool_metrics)
+instrumentation.add_collector(verified_tokens.metrics)
 
 '''
 @TODO uncomment the following line to initialize the datbase
@@ -18,25 +24,58 @@ CORS(app)
 '''
 # db_drop_and_create_all()
 
+## Drink listings
+'''
+drinks_response(form)
+    the encoded {"success": True, "drinks": [...]} body for form 'short' or
+    'long', kept until the drink table version changes so repeated menu
+    fetches cost one dict lookup. The routes answer a current If-None-Match
+    with a 304 before getting here.
+'''
+_listings = {}
+
+
+def drinks_response(form):
+    version = table_versions.version(Drink.__tablename__)
+    cached = _listings.get(form)
+    if cached is None or cached[0] != version:
+        drinks = Drink.query.order_by(Drink.id).all()
+        body = json.dumps({
+            'success': True,
+            'drinks': [drink.short() if form == 'short' else drink.long() for drink in drinks]
+        }).encode('utf-8')
+        cached = _listings[form] = (version, body)
+    return app.response_class(cached[1], mimetype='application/json')
+
+
 ## ROUTES
 '''
-@TODO implement endpoint
+endpoint
     GET /drinks
         it should be a public endpoint
         it should contain only the drink.short() data representation
     returns status code 200 and json {"success": True, "drinks": drinks} where drinks is the list of drinks
         or appropriate status code indicating reason for failure
 '''
+@app.route('/drinks')
+@conditional(table_versions, Drink.__tablename__)
+def get_drinks():
+    return drinks_response('short')
 
 
 '''
-@TODO implement endpoint
+endpoint
     GET /drinks-detail
         it should require the 'get:drinks-detail' permission
         it should contain the drink.long() data representation
     returns status code 200 and json {"success": True, "drinks": drinks} where drinks is the list of drinks
         or appropriate status code indicating reason for failure
 '''
+@app.route('/drinks-detail')
+@requires_auth('get:drinks-detail')
+@conditional(table_versions, Drink.__tablename__)
+def get_drinks_detail(payload):
+    return drinks_response('long')
 
 
 '''
@@ -99,12 +138,27 @@ def unprocessable(error):
 '''
 
 '''
-@TODO implement error handler for 404
+error handler for 404
     error handler should conform to general task above 
 '''
+@app.errorhandler(404)
+def not_found(error):
+    return jsonify({
+                    "success": False, 
+                    "error": 404,
+                    "message": "resource not found"
+                    }), 404
 
 
 '''
-@TODO implement error handler for AuthError
+error handler for AuthError
     error handler should conform to general task above 
 '''
+@app.errorhandler(AuthError)
+def auth_error(error):
+    return jsonify({
+                    "success": False, 
+                    "error": error.status_code,
+                    "message": error.error['description']
+                    }), error.status_code
+
@@ -0,0 +1,127 @@
+"""Cache of the identity provider's JSON Web Key Set, keyed by kid.
+
+    jwks = JWKSCache(f'https://{AUTH0_DOMAIN}/.well-known/jwks.json')
+    rsa_key = jwks.get_key(unverified_header['kid'])
+
+The key set is fetched on first use and kept for `ttl` seconds. A lookup in
+the last `refresh_ahead` seconds of that window, or after it, starts a
+refresh in a background thread and is answered from the keys already held,
+so requests only wait on the network while no keys are held at all.
+
+A kid that is not in the set (the provider rotated its signing key) triggers
+one refetch; it is not fetched for again until the next scheduled refresh,
+and such refetches start at most once every `refetch_interval` seconds so a
+stream of made-up kids cannot turn into a stream of fetches.
+Fetches are single-flight: threads that need keys while a fetch is running
+wait for that fetch instead of starting their own. When the provider cannot
+be reached the keys already held keep being served, past `ttl` if need be,
+and the fetch is retried in the background every `retry_interval` seconds.
+"""
+import json
+import threading
+import time
+from urllib.request import urlopen
+
+KEY_FIELDS = ('kty', 'kid', 'use', 'n', 'e')
+
+
+class JWKSCache:
+
+    def __init__(self, url, ttl=600, refresh_ahead=60, retry_interval=30, refetch_interval=5, timeout=5,
+                 clock=time.monotonic):
+        self.url = url
+        self.ttl = ttl
+        self.refresh_ahead = min(refresh_ahead, ttl)
+        self.retry_interval = retry_interval
+        self.refetch_interval = refetch_interval
+        self.timeout = timeout
+        self.clock = clock
+        self.fetches = 0
+        self.failures = 0
+        self._keys = {}
+        self._refresh_at = 0
+        self._expires_at = 0
+        self._started_at = None
+        self._tried = set()
+        self._flight = None
+        self._lock = threading.Lock()
+
+    def get_key(self, kid):
+        """Return the JWK for kid as a dict, or None if the provider has no such key."""
+        now = self.clock()
+        if not self._keys and now >= self._expires_at:
+            # first use, or every fetch so far failed: nothing to serve
+            # while waiting
+            self.refresh(wait=True, scheduled=True)
+        elif now >= self._refresh_at:
+            # due or expired: keep serving the keys held, stale if the
+            # provider is down, and never wait for it here
+            self.refresh(wait=False, scheduled=True)
+
+        key = self._keys.get(kid)
+        if key is None:
+            with self._lock:
+                refetch = kid not in self._tried and (
+                    self._started_at is None or now >= self._started_at + self.refetch_interval)
+                if refetch:
+                    self._tried.add(kid)
+            if refetch:
+                self.refresh(wait=True)
+            else:
+                self._wait()
+            key = self._keys.get(kid)
+        return key
+
+    def refresh(self, wait=True, scheduled=False):
+        """Fetch the key set, or join the fetch already in flight.
+
+        A scheduled refresh also lets unknown kids be fetched for again.
+        """
+        with self._lock:
+            flight = self._flight
+            leader = flight is None
+            if leader:
+                flight = self._flight = threading.Event()
+                self._started_at = self.clock()
+                if scheduled:
+                    self._tried.clear()
+        if not leader:
+            if wait:
+                flight.wait(self.timeout * 2)
+        elif wait:
+            self._fetch(flight)
+        else:
+            threading.Thread(target=self._fetch, args=(flight,), daemon=True).start()
+
+    def _wait(self):
+        with self._lock:
+            flight = self._flight
+        if flight is not None:
+            flight.wait(self.timeout * 2)
+
+    def _load(self):
+        with urlopen(self.url, timeout=self.timeout) as response:
+            jwks = json.loads(response.read())
+        return {
+            key['kid']: {field: key[field] for field in KEY_FIELDS if field in key}
+            for key in jwks['keys'] if 'kid' in key
+        }
+
+    def _fetch(self, flight):
+        try:
+            keys = self._load()
+        except Exception:
+            with self._lock:
+                self.failures += 1
+                self._refresh_at = self._expires_at = self.clock() + self.retry_interval
+        else:
+            with self._lock:
+                self.fetches += 1
+                self._keys = keys
+                now = self.clock()
+                self._refresh_at = now + self.ttl - self.refresh_ahead
+                self._expires_at = now + self.ttl
+        finally:
+            with self._lock:
+                self._flight = None
+            flight.set()
@@ -0,0 +1,99 @@
+"""Cache of verified JWT payloads, so a token is checked once per lifetime.
+
+    verified = TokenCache(maxsize=4096)
+    payload = verified.verify(token, verify_decode_jwt)
+
+Clients send the same bearer token on every request until it expires. The
+first request pays for the RS256 signature check and claims validation;
+later ones find the payload under the SHA-256 of the token. Entries leave
+the cache at the token's `exp` claim (or after `max_age` seconds, whichever
+comes first) and the least recently used entry is dropped when the cache is
+full. Failed verifications are not cached. Cached payloads are shared
+between requests and must not be modified.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenCache:
+
+    def __init__(self, maxsize=4096, max_age=None, clock=time.time):
+        self.maxsize = maxsize
+        self.max_age = max_age
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.verify_seconds = 0.0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def verify(self, token, verify):
+        """Return the cached payload for token, or verify(token) and cache it."""
+        key = hashlib.sha256(token.encode('utf-8')).digest()
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                payload, expires_at = entry
+                if now < expires_at:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return payload
+                del self._entries[key]
+
+        started = time.perf_counter()
+        payload = verify(token)
+        elapsed = time.perf_counter() - started
+
+        expires_at = payload.get('exp', now)
+        if self.max_age is not None:
+            expires_at = min(expires_at, now + self.max_age)
+        with self._lock:
+            self.misses += 1
+            self.verify_seconds += elapsed
+            if expires_at > now:
+                self._entries[key] = (payload, expires_at)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return payload
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            average = self.verify_seconds / self.misses if self.misses else 0.0
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'verify_seconds': self.verify_seconds,
+                'saved_seconds': self.hits * average,
+            }
+
+    def metrics(self):
+        """Prometheus text lines for SQLInstrumentation.add_collector."""
+        stats = self.stats()
+        return [
+            '# HELP auth_token_cache_hits_total Requests served a cached verified token.',
+            '# TYPE auth_token_cache_hits_total counter',
+            'auth_token_cache_hits_total {}'.format(stats['hits']),
+            '# HELP auth_token_cache_misses_total Requests that verified their token.',
+            '# TYPE auth_token_cache_misses_total counter',
+            'auth_token_cache_misses_total {}'.format(stats['misses']),
+            '# HELP auth_token_cache_hit_ratio Share of requests served a cached verified token.',
+            '# TYPE auth_token_cache_hit_ratio gauge',
+            'auth_token_cache_hit_ratio {}'.format(stats['hit_rate']),
+            '# HELP auth_token_verify_seconds_total Time spent verifying tokens.',
+            '# TYPE auth_token_verify_seconds_total counter',
+            'auth_token_verify_seconds_total {}'.format(stats['verify_seconds']),
+            '# HELP auth_token_verify_saved_seconds_total Verification time avoided by cache hits.',
+            '# TYPE auth_token_verify_saved_seconds_total counter',
+            'auth_token_verify_saved_seconds_total {}'.format(stats['saved_seconds']),
+        ]
@@ -0,0 +1,115 @@
+"""Conditional GET for JSON endpoints, validated by table version counters.
+
+    table_versions = TableVersions(db)
+    table_versions.bump('questions')          # in Model.insert/update/delete, before the commit
+
+    @app.route('/questions')
+    @conditional(table_versions, 'questions', 'categories')
+    def get_questions():
+        ...
+
+Every table an endpoint reads from has a row in the table_versions table
+that the model write methods bump in the same transaction as the write, so
+every worker process sees the same versions and they survive restarts. The
+strong ETag of a response is known from the versions alone, before the view
+runs, and a request whose If-None-Match holds the current ETag is answered
+304 without serializing anything. Responses carry Cache-Control (no-cache by
+default, so clients revalidate on every poll) and a Last-Modified of the
+most recent bump.
+
+Each process reads all versions with one small query and trusts them for
+`max_age` seconds, so a write made by another process is picked up at most
+that long after it commits. Writes that bypass the model methods are not
+seen. Only If-None-Match is honored; If-Modified-Since has one-second
+resolution and could validate a response older than a write made in the
+same second.
+"""
+import threading
+import time
+from functools import wraps
+
+from flask import make_response, request
+from sqlalchemy import BigInteger, Column, Float, String, Table, select
+from sqlalchemy.exc import IntegrityError
+
+
+class TableVersions:
+
+    def __init__(self, db, max_age=1.0):
+        self.db = db
+        self.max_age = max_age
+        self.table = Table(
+            'table_versions', db.metadata,
+            Column('name', String(64), primary_key=True),
+            Column('version', BigInteger, nullable=False),
+            Column('modified', Float, nullable=False),
+        )
+        self._lock = threading.Lock()
+        self._versions = {}
+        self._loaded_at = None
+        self._generation = 0
+
+    def bump(self, table):
+        """Increment the version of table in the current transaction."""
+        session = self.db.session
+        columns = self.table.c
+        bump = self.table.update().where(columns.name == table) \
+            .values(version=columns.version + 1, modified=time.time())
+        if not session.execute(bump).rowcount:
+            try:
+                with session.begin_nested():
+                    session.execute(self.table.insert().values(name=table, version=1, modified=time.time()))
+            except IntegrityError:
+                # another transaction created the row first
+                session.execute(bump)
+        with self._lock:
+            # read the versions again on the next request of this process
+            self._loaded_at = None
+            self._generation += 1
+
+    def version(self, table):
+        """An opaque value that changes whenever table is bumped."""
+        return self._current().get(table, (0, 0.0))
+
+    def validators(self, tables):
+        """Return the ETag value and Last-Modified timestamp covering tables."""
+        versions = self._current()
+        # a table never bumped has the same validators in every process
+        current = [versions.get(table, (0, 0.0)) for table in tables]
+        etag = '-'.join('{}.{}'.format(version, int(modified * 1000)) for version, modified in current)
+        return etag, max(modified for _, modified in current)
+
+    def _current(self):
+        with self._lock:
+            if self._loaded_at is not None and time.monotonic() < self._loaded_at + self.max_age:
+                return self._versions
+            generation = self._generation
+        columns = self.table.c
+        rows = self.db.session.execute(select(columns.name, columns.version, columns.modified)).all()
+        versions = {name: (version, modified) for name, version, modified in rows}
+        with self._lock:
+            # a bump made while reading may not be in rows; keep reading until none was
+            if generation == self._generation:
+                self._versions = versions
+                self._loaded_at = time.monotonic()
+        return versions
+
+
+def conditional(versions, *tables, cache_control='no-cache'):
+    """Decorate a GET view with ETag, Last-Modified and 304 handling."""
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            etag, modified = versions.validators(tables)
+            if request.if_none_match.contains(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.last_modified = modified
+            response.headers['Cache-Control'] = cache_control
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,149 @@
+"""Engine and connection pool settings shared by the Flask-SQLAlchemy apps.
+
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(database_uri)
+    engine = create_async_engine(url, **engine_options(database_uri, asyncio=True))
+
+Settings are read from the environment so every gunicorn worker of a
+deployment gets the same pool:
+
+    DB_POOL_SIZE           connections kept open per process (5)
+    DB_MAX_OVERFLOW        extra connections allowed under load (10)
+    DB_POOL_TIMEOUT        seconds to wait for a free connection (30)
+    DB_POOL_RECYCLE        seconds before a connection is replaced (1800)
+    DB_POOL_PRE_PING       test connections on checkout (1)
+    DB_STATEMENT_TIMEOUT   Postgres statement_timeout in ms (0 = off)
+    DB_TRANSACTION_POOLING set to 1 behind PgBouncer in transaction mode
+
+Behind a transaction-pooling PgBouncer the bouncer owns the pool, so the
+process keeps no connections of its own (NullPool) and the statement timeout
+is applied with SET LOCAL at the start of every transaction, since startup
+options are not passed through.
+
+fyyur, the trivia API and the coffee shop are deployed separately, each with
+its own requirements, so each carries a copy of this module. Keep the copies
+identical; asyncio=True needs SQLAlchemy 1.4 or later (fyyur's asgi.py).
+"""
+import os
+import threading
+import time
+import weakref
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import NullPool, QueuePool
+
+try:
+    from sqlalchemy.pool import AsyncAdaptedQueuePool
+except ImportError:
+    AsyncAdaptedQueuePool = None
+
+_pools = weakref.WeakSet()
+
+
+class _CheckoutTimer:
+    """Pool mixin that records how long checkouts wait for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.timeouts = 0
+        _pools.add(self)
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            with self.stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            with self.stats_lock:
+                self.checkouts += 1
+                self.wait_seconds += waited
+                self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+
+class TimedQueuePool(_CheckoutTimer, QueuePool):
+    pass
+
+
+if AsyncAdaptedQueuePool is not None:
+    class TimedAsyncQueuePool(_CheckoutTimer, AsyncAdaptedQueuePool):
+        pass
+
+
+def _env(name, default, cast=int):
+    value = os.environ.get(name)
+    return default if value in (None, '') else cast(value)
+
+
+@event.listens_for(Engine, 'begin')
+def _set_local_statement_timeout(conn):
+    timeout = conn.get_execution_options().get('local_statement_timeout')
+    if timeout:
+        conn.execute(text('SET LOCAL statement_timeout = {:d}'.format(timeout)))
+
+
+def engine_options(database_uri, asyncio=False):
+    """Return SQLALCHEMY_ENGINE_OPTIONS for database_uri.
+
+    With asyncio=True the options are for create_async_engine() with asyncpg.
+    """
+    if database_uri.startswith('sqlite'):
+        return {}
+
+    statement_timeout = _env('DB_STATEMENT_TIMEOUT', 0)
+    if _env('DB_TRANSACTION_POOLING', 0):
+        options = {'poolclass': NullPool}
+        if statement_timeout:
+            options['execution_options'] = {'local_statement_timeout': statement_timeout}
+        return options
+
+    options = {
+        'poolclass': TimedAsyncQueuePool if asyncio else TimedQueuePool,
+        'pool_size': _env('DB_POOL_SIZE', 5),
+        'max_overflow': _env('DB_MAX_OVERFLOW', 10),
+        'pool_timeout': _env('DB_POOL_TIMEOUT', 30),
+        'pool_recycle': _env('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': bool(_env('DB_POOL_PRE_PING', 1)),
+    }
+    if statement_timeout and asyncio:
+        options['connect_args'] = {'server_settings': {'statement_timeout': str(statement_timeout)}}
+    elif statement_timeout:
+        options['connect_args'] = {'options': '-c statement_timeout={:d}'.format(statement_timeout)}
+    return options
+
+
+def pool_metrics():
+    """Prometheus text lines describing every TimedQueuePool in the process."""
+    series = [
+        ('db_pool_checkouts_total', 'counter', 'Connections checked out of the pool.'),
+        ('db_pool_checkout_wait_seconds_total', 'counter', 'Time spent waiting for a pooled connection.'),
+        ('db_pool_checkout_wait_seconds_max', 'gauge', 'Longest wait for a pooled connection.'),
+        ('db_pool_checkout_timeouts_total', 'counter', 'Checkouts that failed waiting for a connection.'),
+        ('db_pool_checked_out', 'gauge', 'Connections currently in use.'),
+        ('db_pool_utilization', 'gauge', 'Connections in use over pool_size + max_overflow.'),
+    ]
+    samples = {name: [] for name, _, _ in series}
+    for pool in list(_pools):
+        label = '{{pool="{}"}}'.format(id(pool))
+        capacity = pool.size() + max(pool._max_overflow, 0)
+        with pool.stats_lock:
+            samples['db_pool_checkouts_total'].append((label, pool.checkouts))
+            samples['db_pool_checkout_wait_seconds_total'].append((label, pool.wait_seconds))
+            samples['db_pool_checkout_wait_seconds_max'].append((label, pool.max_wait_seconds))
+            samples['db_pool_checkout_timeouts_total'].append((label, pool.timeouts))
+        samples['db_pool_checked_out'].append((label, pool.checkedout()))
+        samples['db_pool_utilization'].append((label, pool.checkedout() / capacity if capacity else 0))
+
+    lines = []
+    for name, kind, help_text in series:
+        lines.append('# HELP {} {}'.format(name, help_text))
+        lines.append('# TYPE {} {}'.format(name, kind))
+        lines.extend('{}{} {}'.format(name, label, value) for label, value in samples[name])
+    return lines
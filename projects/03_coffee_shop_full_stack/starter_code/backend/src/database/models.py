@@ -3,12 +3,18 @@ from sqlalchemy import Column, String, Integer
 from flask_sqlalchemy import SQLAlchemy
 import json
 
+from .db_pool import engine_options
+from ..conditional import TableVersions
+
 database_filename = "database.db"
 project_dir = os.path.dirname(os.path.abspath(__file__))
 database_path = "sqlite:///{}".format(os.path.join(project_dir, database_filename))
 
 db = SQLAlchemy()
 
+# bumped by the model write methods in the write's transaction, see conditional.py
+table_versions = TableVersions(db)
+
 '''
 setup_db(app)
     binds a flask application and a SQLAlchemy service
@@ -16,6 +22,7 @@ setup_db(app)
 def setup_db(app):
     app.config["SQLALCHEMY_DATABASE_URI"] = database_path
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(database_path)
     db.app = app
     db.init_app(app)
 
@@ -28,6 +35,20 @@ db_drop_and_create_all()
 def db_drop_and_create_all():
     db.drop_all()
     db.create_all()
+    _representations.clear()
+    table_versions.bump(Drink.__tablename__)
+    db.session.commit()
+
+'''
+representation cache
+    the parsed recipe and the short() and long() dicts of each drink, keyed by
+    id together with the title and recipe they were built from, so they are
+    only rebuilt when the row changes. insert(), update() and delete() drop
+    the drink's entry and bump the drink table version, which cached drink
+    listings and their ETags are checked against. The cached dicts are shared
+    and must not be modified.
+'''
+_representations = {}
 
 '''
 Drink
@@ -42,29 +63,43 @@ class Drink(db.Model):
     # the required datatype is [{'color': string, 'name':string, 'parts':number}]
     recipe =  Column(String(180), nullable=False)
 
+    def _representation(self):
+        cached = _representations.get(self.id)
+        if cached is None or cached[0] != self.title or cached[1] != self.recipe:
+            recipe = json.loads(self.recipe)
+            short = {
+                'id': self.id,
+                'title': self.title,
+                'recipe': [{'color': r['color'], 'parts': r['parts']} for r in recipe]
+            }
+            long = {
+                'id': self.id,
+                'title': self.title,
+                'recipe': recipe
+            }
+            cached = (self.title, self.recipe, short, long)
+            if self.id is not None:
+                _representations[self.id] = cached
+        return cached
+
+    def _commit(self, id):
+        table_versions.bump(Drink.__tablename__)
+        db.session.commit()
+        _representations.pop(id, None)
+
     '''
     short()
         short form representation of the Drink model
     '''
     def short(self):
-        print(json.loads(self.recipe))
-        short_recipe = [{'color': r['color'], 'parts': r['parts']} for r in json.loads(self.recipe)]
-        return {
-            'id': self.id,
-            'title': self.title,
-            'recipe': short_recipe
-        }
+        return self._representation()[2]
 
     '''
     long()
         long form representation of the Drink model
     '''
     def long(self):
-        return {
-            'id': self.id,
-            'title': self.title,
-            'recipe': json.loads(self.recipe)
-        }
+        return self._representation()[3]
 
     '''
     insert()
@@ -77,7 +112,8 @@ class Drink(db.Model):
     '''
     def insert(self):
         db.session.add(self)
-        db.session.commit()
+        db.session.flush()
+        self._commit(self.id)
 
     '''
     delete()
@@ -88,8 +124,9 @@ class Drink(db.Model):
             drink.delete()
     '''
     def delete(self):
+        id = self.id
         db.session.delete(self)
-        db.session.commit()
+        self._commit(id)
 
     '''
     update()
@@ -101,7 +138,7 @@ class Drink(db.Model):
             drink.update()
     '''
     def update(self):
-        db.session.commit()
+        self._commit(self.id)
 
     def __repr__(self):
         return json.dumps(self.short())
\ No newline at end of file
@@ -0,0 +1,81 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import src.database.models as models
+
+# keep the tests away from src/database/database.db
+database_dir = tempfile.mkdtemp()
+models.database_path = 'sqlite:///{}'.format(os.path.join(database_dir, 'test.db'))
+
+from src.api import app
+from src.auth.auth import verified_tokens
+from src.database.models import db_drop_and_create_all, Drink
+
+
+class DrinkListingsTestCase(unittest.TestCase):
+    """This class represents the drink listings test case"""
+
+    def setUp(self):
+        self.client = app.test_client
+        self.ctx = app.app_context()
+        self.ctx.push()
+        db_drop_and_create_all()
+        Drink(title='water', recipe=json.dumps([{'name': 'water', 'color': 'blue', 'parts': 1}])).insert()
+
+        payload = {'sub': 'barista', 'permissions': frozenset(['get:drinks-detail'])}
+        patcher = mock.patch.object(verified_tokens, 'verify', return_value=payload)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        models.db.session.remove()
+        self.ctx.pop()
+
+    def listings(self):
+        drinks = self.client().get('/drinks')
+        detail = self.client().get('/drinks-detail', headers={'Authorization': 'Bearer token'})
+        self.assertEqual(drinks.status_code, 200)
+        self.assertEqual(detail.status_code, 200)
+        return json.loads(drinks.data)['drinks'], json.loads(detail.data)['drinks']
+
+    def test_listings_follow_inserts(self):
+        self.listings()
+        recipe = [{'name': 'milk', 'color': 'grey', 'parts': 1}, {'name': 'coffee', 'color': 'brown', 'parts': 3}]
+        Drink(title='latte', recipe=json.dumps(recipe)).insert()
+
+        drinks, detail = self.listings()
+        self.assertEqual([drink['title'] for drink in drinks], ['water', 'latte'])
+        self.assertEqual(drinks[1]['recipe'], [{'color': 'grey', 'parts': 1}, {'color': 'brown', 'parts': 3}])
+        self.assertEqual(detail[1]['recipe'], recipe)
+
+    def test_listings_follow_updates(self):
+        self.listings()
+        drink = Drink.query.filter(Drink.title == 'water').one()
+        drink.title = 'sparkling water'
+        drink.recipe = json.dumps([{'name': 'soda', 'color': 'white', 'parts': 2}])
+        drink.update()
+
+        drinks, detail = self.listings()
+        self.assertEqual(drinks, [{'id': drink.id, 'title': 'sparkling water', 'recipe': [{'color': 'white', 'parts': 2}]}])
+        self.assertEqual(detail[0]['recipe'], [{'name': 'soda', 'color': 'white', 'parts': 2}])
+
+    def test_listings_follow_deletes(self):
+        self.listings()
+        Drink.query.filter(Drink.title == 'water').one().delete()
+        self.assertEqual(self.listings(), ([], []))
+
+    def test_etag_follows_writes(self):
+        etag = self.client().get('/drinks').headers['ETag']
+        self.assertEqual(self.client().get('/drinks', headers={'If-None-Match': etag}).status_code, 304)
+        Drink.query.filter(Drink.title == 'water').one().delete()
+        res = self.client().get('/drinks', headers={'If-None-Match': etag})
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res.headers['ETag'], etag)
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()